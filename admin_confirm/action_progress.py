@@ -0,0 +1,84 @@
+"""Chunked execution of confirmed actions, and the progress of their execution.
+
+An action confirmed with `@confirm_action(chunk_size=...)` is called once per chunk of
+the selection instead of once with the whole queryset. Chunks are consecutive pk ranges,
+each run in its own transaction, so locks are only held for the duration of a chunk.
+
+When the action is already run in a transaction, eg. with ATOMIC_REQUESTS, the chunks
+are only savepoints of it: nothing is committed and no lock is released before the
+whole action is done. Queue such actions with `@confirm_action(queued=True)` instead,
+as the workers do not run them in a transaction.
+
+The progress of the execution is kept in the cache, under a key namespaced per
+confirmation, so that the confirmation page can poll it while the action runs.
+"""
+
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+
+from admin_confirm.constants import ACTION_PROGRESS_CACHE_KEY, CACHE_TIMEOUT
+from admin_confirm.utils import format_namespaced_key, log
+
+# Only used by queued actions, see admin_confirm.queue
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def set_progress(namespace: Optional[str], **progress):
+    if namespace:
+        cache.set(format_namespaced_key(ACTION_PROGRESS_CACHE_KEY, namespace), progress, CACHE_TIMEOUT)
+
+
+def get_progress(namespace: Optional[str]) -> Optional[dict]:
+    if not namespace:
+        return None
+    return cache.get(format_namespaced_key(ACTION_PROGRESS_CACHE_KEY, namespace))
+
+
+def iter_chunks(queryset, chunk_size: int):
+    """
+    Split the queryset into querysets of at most chunk_size objects, by consecutive pk ranges
+
+    Each chunk is found with a single query on the pks following the previous chunk,
+    so the selection is never loaded as a whole.
+    """
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        remaining = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        pks = list(remaining.values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield queryset.filter(pk__gte=pks[0], pk__lte=pks[-1])
+        last_pk = pks[-1]
+
+
+def run_in_chunks(func, modeladmin, request, queryset, chunk_size: int, namespace: Optional[str] = None):
+    """
+    Call the action once per chunk, each in its own transaction, recording the progress
+
+    Returns the response of the last chunk which returned one, if any
+    """
+    using = router.db_for_write(queryset.model)
+    if connections[using].in_atomic_block:
+        log(f"Warning: action {func.__name__} is run in a transaction, so its chunks are only committed with it")
+    total = queryset.count()
+    done = 0
+    response = None
+    set_progress(namespace, status=RUNNING, done=done, total=total)
+    try:
+        for chunk in iter_chunks(queryset, chunk_size):
+            with transaction.atomic(using=using):
+                response = func(modeladmin, request, chunk) or response
+            done = min(done + chunk_size, total)
+            log(f"Action {func.__name__} done on {done} of {total}")
+            set_progress(namespace, status=RUNNING, done=done, total=total)
+    except Exception:
+        set_progress(namespace, status=FAILED, done=done, total=total)
+        raise
+    set_progress(namespace, status=DONE, done=total, total=total)
+    return response
@@ -1,25 +1,40 @@
+import copy
 import functools
+import secrets
+from contextlib import suppress
 from django.contrib.admin.exceptions import DisallowedModelAdminToField
-from django.contrib.admin.utils import flatten_fieldsets, unquote
+from django.contrib.admin.utils import NotRelationField, flatten_fieldsets, get_fields_from_path, unquote
+from django.core import signing
 from django.core.cache import cache
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import FieldDoesNotExist, PermissionDenied, ValidationError
+from django.contrib import messages
+from django.http import Http404, HttpResponseRedirect, JsonResponse, QueryDict
+from django.db import router, transaction
+from django.db.models import BooleanField, Count, ManyToManyField, Sum
+from django.forms import ModelChoiceField
 from django.forms.formsets import all_valid
+from django.forms.widgets import ChoiceWidget
 from django.template.response import TemplateResponse
-from django.contrib.admin.options import TO_FIELD_VAR
+from django.urls import NoReverseMatch, path, reverse
+from django.contrib.admin.options import IS_POPUP_VAR, TO_FIELD_VAR, ModelAdmin
 from django.utils.translation import gettext as _
 from django.contrib.admin import helpers
-from django.db.models import FileField, ImageField
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_control
 from admin_confirm.utils import (
     log,
     get_admin_change_url,
     format_cache_key,
+    format_namespaced_key,
+    get_confirmation_namespace,
 )
 from admin_confirm.constants import (
+    ACTION_PROGRESS_TOKEN,
+    ACTION_SELECTION_TOKEN,
     CONFIRM_DELETE,
     CONFIRMATION_OPTIONS,
     CONFIRMATION_RECEIVED,
+    CONFIRMATION_TOKEN,
     CONFIRM_ADD,
     CONFIRM_CHANGE,
     SAVE,
@@ -28,9 +43,18 @@ from admin_confirm.constants import (
     SAVE_AND_CONTINUE,
     SAVE_AS_NEW,
     CACHE_TIMEOUT,
+    PENDING_CONFIRMATIONS_LIMIT,
+    PENDING_CONFIRMATIONS_SESSION_KEY,
+    PURGE_WITHOUT_FILE_FIELDS,
 )
+from admin_confirm.dry_run import dry_run as run_dry
+from admin_confirm.action_progress import DONE, FAILED, get_progress, run_in_chunks
+from admin_confirm.queue import get_progress_namespace, get_queue_backend
+from admin_confirm.field_plan import get_confirmation_field_plan, get_declared_admin_fields, get_model_field_plan
 from admin_confirm.file_cache import FileCache
-from admin_confirm.form import get_changed_data
+from admin_confirm.form import get_changed_data, get_model_fields, raw_value_matches
+from admin_confirm.selection import dumps_selection, encode_pks, loads_selection
+from admin_confirm.serialization import deserialize_object, serialize_object
 
 
 class BaseAdminConfirmMixin:
@@ -47,19 +71,21 @@ class BaseAdminConfirmMixin:
         """
         Hook for specifying confirmation fields
         """
+        return list(self._get_confirmation_field_plan(request, obj).confirmation_fields)
+
+    def _get_confirmation_field_plan(self, request, obj=None):
+        "The plan is shared by all admins of the model with the same confirmation fields and fieldsets"
         if self.confirmation_fields and str(self.confirmation_fields) != "__all__":
             # set confirmation fields if specified
-            confirmation_fields = set(self.confirmation_fields)
+            confirmation_fields = tuple(self.confirmation_fields)
         else:
             # default confirmation fields to all fields, including ManyToManyFields
-            confirmation_fields = set([field.name for field in self.model._meta.fields]) | set(
-                field.name for field in self.model._meta.get_fields()
-            )
+            confirmation_fields = None
 
-        # filter to valid fields which are visible on the admin page
-        admin_fields = set(flatten_fieldsets(self.get_fieldsets(request, obj)))
-        log(f"[Admin fields are {admin_fields} and confirmation fields are {confirmation_fields}")
-        return list(confirmation_fields & admin_fields)
+        admin_fields = get_declared_admin_fields(self)
+        if admin_fields is None:
+            admin_fields = tuple(flatten_fieldsets(self.get_fieldsets(request, obj)))
+        return get_confirmation_field_plan(self.model, confirmation_fields, admin_fields)
 
 
 class InlineAdminConfirmMixin(BaseAdminConfirmMixin):
@@ -79,6 +105,44 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
     change_confirmation_template = None
     action_confirmation_template = None
 
+    # Should the submitted POST be cached server-side, so that the confirmation page
+    # only posts back a token instead of the whole hidden form?
+    cache_confirmation_post = False
+
+    # Should the submitted form be embedded in the confirmation page as plain hidden inputs
+    # instead of full widgets? Avoids evaluating the querysets of the choice fields.
+    confirmation_form_as_hidden_inputs = False
+
+    # Should the raw submission be compared to the stored values before the form and formsets
+    # are built? If none of the confirmation fields could have changed, the change is saved as usual.
+    # Note that changes made by the form's own cleaning are not seen by this check.
+    confirmation_precheck = False
+
+    # Should the action confirmation page post back the selected pks as a single signed token,
+    # instead of a hidden input per selected object?
+    action_selection_as_token = False
+
+    # If set, the action confirmation page only shows how many objects are selected and the first
+    # objects up to this limit, instead of every selected object
+    action_confirmation_preview_limit = None
+
+    # If set, the objects on the action confirmation page are shown as the values of these fields
+    # (which can span relations, eg. "shop__name") instead of str(obj), without loading model instances
+    action_confirmation_preview_fields = None
+
+    # If set, the action confirmation page shows a summary of the selection computed in a single
+    # grouped query: the number of objects for each combination of the values of these fields
+    # (True for the fields of list_filter), and the totals of the numeric fields to sum
+    action_confirmation_summary_fields = None
+    action_confirmation_summary_sums = None
+    # Most groups shown in that summary, the totals still being those of the whole selection
+    action_confirmation_summary_limit = 100
+
+    # Maximum number of queries of the confirmation steps, eg. {"render": 10, "submit": (12, 3)}
+    # where a tuple adds queries per submitted inline form. Only checked by the tests using
+    # admin_confirm.testing.ConfirmationQueryBudgetMixin
+    confirmation_query_budget = None
+
     _file_cache = FileCache()
 
     def render_change_confirmation(self, request, context):
@@ -122,20 +186,99 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
             context,
         )
 
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "action_progress/<str:token>/",
+                self.admin_site.admin_view(self.action_progress_view),
+                name=f"{opts.app_label}_{opts.model_name}_action_progress",
+            ),
+            path(
+                "queued_action/<str:job_id>/",
+                self.admin_site.admin_view(self.queued_action_view),
+                name=f"{opts.app_label}_{opts.model_name}_queued_action",
+            ),
+            *super().get_urls(),
+        ]
+
+    def action_progress_view(self, request, token):
+        """
+        Progress of the chunked execution of a confirmed action, polled by the confirmation page.
+        Only reachable from the session which confirmed the action.
+        """
+        progress = get_progress(get_confirmation_namespace(request, token))
+        if progress is None:
+            raise Http404
+        return JsonResponse(progress)
+
+    def queued_action_view(self, request, job_id):
+        """
+        Status page of an action confirmed with @confirm_action(queued=True).
+        Only reachable by the user who confirmed the action, or a superuser.
+        """
+        job = get_queue_backend().get(job_id)
+        if (
+            job is None
+            or job["model"] != self.model._meta.label_lower
+            or (job["user_id"] != request.user.pk and not request.user.is_superuser)
+        ):
+            raise Http404
+        finished = job["status"] in (DONE, FAILED)
+        context = {
+            **self.admin_site.each_context(request),
+            "title": _("Queued Action"),
+            "opts": self.model._meta,
+            "job": job,
+            "finished": finished,
+            "progress": None if finished else get_progress(get_progress_namespace(job["id"])),
+        }
+        return TemplateResponse(request, "admin/queued_action.html", context)
+
+    def _get_request_memo(self, request, name):
+        "Dict memoizing `name` for this admin for the lifetime of the request"
+        return get_request_memo(request, self, name)
+
+    def get_object(self, request, object_id, from_field=None):
+        """
+        Memoized on the request, as the object is needed by several steps of the confirmation
+
+        Each call gets its own copy, as forms modify the instance they are given
+        """
+        objects = self._get_request_memo(request, "object")
+        key = (str(object_id), from_field)
+        if key not in objects:
+            objects[key] = super().get_object(request, object_id, from_field)
+        obj = objects[key]
+        return copy.copy(obj) if obj is not None else None
+
+    def get_inline_instances(self, request, obj=None):
+        """
+        Memoized on the request, as building the inlines runs their permission checks
+        An unsaved object shares the memo with no object, as Django treats both as an add
+        """
+        inline_instances = self._get_request_memo(request, "inline_instances")
+        key = obj and obj.pk
+        if key not in inline_instances:
+            inline_instances[key] = super().get_inline_instances(request, obj)
+        return inline_instances[key]
+
     @method_decorator(cache_control(private=True))
     def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
-        obj = self.get_object(request, unquote(object_id) if object_id else None) or None
+        obj = self.get_object(request, unquote(object_id)) if object_id else None
         confirmation_options = self._get_confirmation_options(request, obj)
         if request.method == "POST":
             if CONFIRMATION_RECEIVED in request.POST:
                 return self._confirmation_received_view(request, object_id, form_url, extra_context)
 
-            self._file_cache.delete_all()
-            cache.delete_many(CACHE_KEYS.values())
+            if PURGE_WITHOUT_FILE_FIELDS or self._has_file_fields():
+                self._clear_pending_confirmations(request, object_id)
 
             if request.POST.keys() & set(confirmation_options):
                 log("confirmation configured")
-                return self._change_confirmation_view(request, object_id, form_url, extra_context)
+                if not self.confirmation_precheck or self._confirmation_may_be_required(request, obj):
+                    return self._change_confirmation_view(request, object_id, form_url, extra_context)
+                log("No confirmation field changed")
 
         extra_context = {
             **(extra_context or {}),
@@ -144,6 +287,13 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
         return super().changeform_view(request, object_id, form_url, extra_context)
 
     def _get_confirmation_options(self, request, obj=None) -> list[str]:
+        memo = self._get_request_memo(request, "confirmation_options")
+        key = obj and obj.pk
+        if key not in memo:
+            memo[key] = self._compute_confirmation_options(request, obj)
+        return memo[key]
+
+    def _compute_confirmation_options(self, request, obj=None) -> list[str]:
         options = []
         if self.confirm_add:
             options.append(CONFIRM_ADD)
@@ -167,6 +317,9 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
         This is required because file(s) cannot be programmically uploaded
         ie. There is no way to set a file on the html form
 
+        When cache_confirmation_post is set, the POST is replayed from the cache
+        before anything else is done.
+
         If the form isn't multipart, this function would not be called.
         If there are no file changes, do nothing to the request and send to Django.
 
@@ -176,6 +329,27 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
         and pass the request to Django
         """
         log("Confirmation has been received")
+        # Without a token (eg. from an overridden template) there is no namespace, so nothing cached is found
+        namespace = get_confirmation_namespace(request, request.POST.get(CONFIRMATION_TOKEN))
+        object_key = format_namespaced_key(CACHE_KEYS["object"], namespace)
+        post_key = format_namespaced_key(CACHE_KEYS["post"], namespace)
+        replay_post = self.cache_confirmation_post and namespace is not None
+        cached = cache.get_many([object_key, post_key] if replay_post else [object_key])
+
+        if replay_post and post_key in cached:
+            request.POST = self._replay_cached_post(request, cached[post_key])
+        elif replay_post:
+            log("Warning: no cached POST")
+            self.message_user(
+                request,
+                _("The confirmation has expired, please submit your changes again."),
+                messages.WARNING,
+            )
+            return HttpResponseRedirect(request.get_full_path())
+
+        cached_payload = cached.get(object_key)
+        # Do not use cache if the model doesn't match this model
+        cached_object = cached_payload and deserialize_object(cached_payload, self.model)
 
         def _reconstruct_request_files():
             """
@@ -184,33 +358,28 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
             """
             reconstructed_files = {}
 
-            cached_object = cache.get(CACHE_KEYS["object"])
             # Reconstruct the files from cached object
             if not cached_object:
                 log("Warning: no cached_object")
                 return
 
-            if type(cached_object) != self.model:
-                # Do not use cache if the model doesn't match this model
-                log(f"Warning: cached_object is not of type {self.model}")
-                return
-
             query_dict = request.POST
 
-            for field in self.model._meta.get_fields():
-                if not isinstance(field, (FileField, ImageField)):
-                    continue
-
-                cached_file = self._file_cache.get(
-                    format_cache_key(model=self.model.__name__, field=field.name)
-                )
+            # If a file was uploaded, the field is omitted from the POST since it's in request.FILES
+            cache_keys = {
+                field_name: format_cache_key(model=self.model.__name__, field=field_name, namespace=namespace)
+                for field_name in get_model_field_plan(self.model).file_fields
+                if not query_dict.get(field_name)
+            }
+            # Get all the cached files in one round-trip
+            cached_files = self._file_cache.get_many(cache_keys.values())
 
-                # If a file was uploaded, the field is omitted from the POST since it's in request.FILES
-                if not query_dict.get(field.name):
-                    if not cached_file:
-                        log(f"Warning: Could not find file cached for field {field.name}")
-                    else:
-                        reconstructed_files[field.name] = cached_file
+            for field_name, cache_key in cache_keys.items():
+                cached_file = cached_files.get(cache_key)
+                if not cached_file:
+                    log(f"Warning: Could not find file cached for field {field_name}")
+                else:
+                    reconstructed_files[field_name] = cached_file
 
             return reconstructed_files
 
@@ -222,13 +391,13 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
             if object_id and SAVE_AS_NEW not in request.POST:
                 # Update the obj with the new uploaded files
                 # then pass rest of changes to Django
-                obj = self.model.objects.filter(id=object_id).first()
+                obj = self.get_object(request, unquote(object_id))
             else:
                 # Create the obj and pass the rest as changes to Django
                 # (Since we are not handling the formsets/inlines)
                 # Note that this results in the "Yes, I'm Sure" submission
                 #   act as a `change` not an `add`
-                obj = cache.get(CACHE_KEYS["object"])
+                obj = cached_object
 
             # remove the confirmation options from post
             modified_post = request.POST.copy()
@@ -243,6 +412,8 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
                     setattr(obj, field, file)
                 obj.save()
                 object_id = str(obj.id)
+                # Django's changeform then gets the object with the files, without loading it again
+                self._get_request_memo(request, "object")[(object_id, None)] = obj
                 # Update the request path, used in the message to user and redirect
                 # Used in `self.response_change`
                 request.path = get_admin_change_url(obj)
@@ -261,11 +432,224 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
 
             request.POST = modified_post
 
-        self._file_cache.delete_all()
-        cache.delete_many(CACHE_KEYS.values())
+        self._clear_confirmation_cache(namespace)
+        self._remove_pending_confirmation(request, namespace)
 
         return super()._changeform_view(request, object_id, form_url, extra_context)
 
+    def _confirmation_may_be_required(self, request, obj):
+        """
+        Compares the raw POST of the confirmation fields, of this model and of the inlines,
+        to the stored values before any form or formset is built.
+
+        Only returns False when none of them could have changed, ie. no confirmation is needed.
+        """
+        if obj is None or SAVE_AS_NEW in request.POST or TO_FIELD_VAR in request.POST:
+            return True
+
+        if self.confirm_change:
+            fields = get_model_fields(self.model, self.get_confirmation_fields(request, obj))
+            if fields is None:
+                return True
+            values = {}
+            for field in fields:
+                if isinstance(field, ManyToManyField):
+                    values[field.name] = {str(pk) for pk in getattr(obj, field.name).values_list("pk", flat=True)}
+                elif field.concrete:
+                    values[field.attname] = getattr(obj, field.attname)
+            if not all(raw_value_matches(field, field.name, request.POST, request.FILES, values) for field in fields):
+                return True
+
+        for prefix, inline in self._get_inline_formset_prefixes(request, obj):
+            if isinstance(inline, InlineAdminConfirmMixin) and self._inline_confirmation_may_be_required(
+                request, obj, inline, prefix
+            ):
+                return True
+        return False
+
+    def _inline_confirmation_may_be_required(self, request, obj, inline, prefix):
+        "Same as _confirmation_may_be_required, for the rows of the formset of the inline"
+        data = request.POST
+        try:
+            total_forms = int(data[f"{prefix}-TOTAL_FORMS"])
+            initial_forms = int(data[f"{prefix}-INITIAL_FORMS"])
+        except (KeyError, ValueError):
+            return True
+
+        if inline.confirm_delete and any(data.get(f"{prefix}-{index}-DELETE") for index in range(total_forms)):
+            return True
+
+        fields = get_model_fields(inline.model, inline.get_confirmation_fields(request, obj))
+        if fields is None:
+            # Fields of the form only, which need the form to be compared
+            return True
+        if not fields:
+            # Only the confirmation fields of the rows are confirmed, deletions aside
+            return False
+
+        if inline.confirm_change and initial_forms:
+            if self._inline_rows_may_have_changed(request, inline, prefix, initial_forms, fields):
+                return True
+        # Whether a new row differs from its defaults needs the form
+        return bool(inline.confirm_add) and any(
+            data.get(f"{prefix}-{index}-{field.name}") or f"{prefix}-{index}-{field.name}" in request.FILES
+            for index in range(initial_forms, total_forms)
+            for field in fields
+        )
+
+    def _inline_rows_may_have_changed(self, request, inline, prefix, initial_forms, fields):
+        "Compares the raw POST of the existing rows of the formset to their stored values"
+        data = request.POST
+        pk_field = inline.model._meta.pk
+        try:
+            pks = [
+                pk_field.to_python(data.get(f"{prefix}-{index}-{pk_field.name}")) for index in range(initial_forms)
+            ]
+        except ValidationError:
+            return True
+        # All the rows in a single query
+        queryset = inline.get_queryset(request).filter(pk__in=pks)
+        attnames = [field.attname for field in fields if field.concrete]
+        rows = {row["pk"]: row for row in queryset.values("pk", *attnames)}
+
+        for index, pk in enumerate(pks):
+            row = rows.get(pk)
+            if row is None or not all(
+                raw_value_matches(field, f"{prefix}-{index}-{field.name}", data, request.FILES, row)
+                for field in fields
+            ):
+                return True
+        return False
+
+    def _get_inline_formset_prefixes(self, request, obj):
+        "The prefix of the formset of each inline, as given by super()._create_formsets"
+        prefixes = {}
+        for FormSet, inline in self.get_formsets_with_inlines(request, obj):
+            prefix = FormSet.get_default_prefix()
+            prefixes[prefix] = prefixes.get(prefix, 0) + 1
+            if prefixes[prefix] != 1 or not prefix:
+                prefix = f"{prefix}-{prefixes[prefix]}"
+            yield prefix, inline
+
+    def _get_post_to_cache(self, request, obj):
+        "The POST to replay on confirmation, without the csrf token and confirmation options."
+        excluded = {"csrfmiddlewaretoken", *self._get_confirmation_options(request, obj)}
+        return {key: values for key, values in request.POST.lists() if key not in excluded}
+
+    def _get_hidden_inputs(self, request, obj):
+        """
+        The submitted form and formsets (including their management forms) as
+        (name, value) pairs, to be embedded in the confirmation page as hidden inputs
+        """
+        excluded = {*SAVE_ACTIONS, IS_POPUP_VAR, TO_FIELD_VAR}
+        return [
+            (key, value)
+            for key, values in self._get_post_to_cache(request, obj).items()
+            if key not in excluded
+            for value in values
+        ]
+
+    def _get_hidden_formsets(self, request, formsets):
+        """
+        The formsets rendered in the hidden form, as (formset, [(inline_form, raw_inputs)]) where
+        raw_inputs is None for the changed inline forms, which are rendered with their widgets.
+
+        The unchanged inline forms are posted back as the (name, value) pairs they were submitted
+        with instead, so rendering the page follows the number of changed rows, not all the rows.
+        """
+        raw_inputs = {}
+        for key, values in request.POST.lists():
+            # Inline form inputs are named <formset prefix>-<index>-<field>
+            raw_inputs.setdefault(key.rpartition("-")[0], []).extend((key, value) for value in values)
+
+        hidden_formsets = []
+        for formset in formsets:
+            inline_forms = [
+                (inline_form, None if inline_form.has_changed() else raw_inputs.get(inline_form.prefix, []))
+                for inline_form in formset.forms
+            ]
+            self._share_inline_choices([inline_form for inline_form, inputs in inline_forms if inputs is None])
+            hidden_formsets.append((formset, inline_forms))
+        return hidden_formsets
+
+    def _share_inline_choices(self, inline_forms):
+        """
+        Load the choices of each model choice field once for the inline forms of a formset,
+        instead of once per inline form, as they are rendered with their select widgets
+        """
+        choices = {}
+        for inline_form in inline_forms:
+            for name, field in inline_form.fields.items():
+                # The widget may be wrapped, eg. by RelatedFieldWidgetWrapper
+                widget = getattr(field.widget, "widget", field.widget)
+                if not isinstance(field, ModelChoiceField) or not isinstance(widget, ChoiceWidget):
+                    continue
+                if name not in choices:
+                    choices[name] = list(field.choices)
+                field.choices = choices[name]
+
+    def _replay_cached_post(self, request, cached_post):
+        "Rebuild the POST of the confirmed submission from the cached one."
+        replayed_post = QueryDict(mutable=True)
+        for key, values in cached_post.items():
+            replayed_post.setlist(key, values)
+        replayed_post[CONFIRMATION_RECEIVED] = request.POST[CONFIRMATION_RECEIVED]
+        replayed_post[CONFIRMATION_TOKEN] = request.POST[CONFIRMATION_TOKEN]
+        return replayed_post
+
+    def _has_file_fields(self):
+        return bool(get_model_field_plan(self.model).file_fields)
+
+    def _add_pending_confirmation(self, request, namespace, object_id):
+        "Mark in the session that data is cached for a confirmation of this object."
+        pending = request.session.get(PENDING_CONFIRMATIONS_SESSION_KEY, [])
+        pending.append([namespace, self.model._meta.label_lower, object_id])
+        # Older confirmations will have expired from the cache by now
+        request.session[PENDING_CONFIRMATIONS_SESSION_KEY] = pending[-PENDING_CONFIRMATIONS_LIMIT:]
+
+    def _remove_pending_confirmation(self, request, namespace):
+        pending = request.session.get(PENDING_CONFIRMATIONS_SESSION_KEY)
+        if namespace and pending:
+            request.session[PENDING_CONFIRMATIONS_SESSION_KEY] = [
+                confirmation for confirmation in pending if confirmation[0] != namespace
+            ]
+
+    def _clear_pending_confirmations(self, request, object_id):
+        """
+        Delete the data cached for confirmations of this object which were abandoned,
+        ie. the object is being saved without going through them.
+
+        Nothing is sent to the cache unless the session says something was staged.
+        """
+        pending = request.session.get(PENDING_CONFIRMATIONS_SESSION_KEY)
+        if not pending:
+            return
+        label = self.model._meta.label_lower
+        abandoned = [
+            namespace
+            for namespace, model_label, pending_object_id in pending
+            if model_label == label and pending_object_id == object_id
+        ]
+        if not abandoned:
+            return
+        request.session[PENDING_CONFIRMATIONS_SESSION_KEY] = [
+            confirmation for confirmation in pending if confirmation[0] not in abandoned
+        ]
+        for namespace in abandoned:
+            log(f"Clearing abandoned confirmation {namespace}")
+            self._clear_confirmation_cache(namespace)
+
+    def _clear_confirmation_cache(self, namespace=None):
+        """
+        Delete the object and files cached for the confirmation with the given namespace.
+        Cached data of other confirmations is left untouched.
+        """
+        self._file_cache.delete_many(
+            format_cache_key(model=self.model.__name__, field=field_name, namespace=namespace)
+            for field_name in get_model_field_plan(self.model).file_fields
+        )
+        cache.delete_many([format_namespaced_key(key, namespace) for key in CACHE_KEYS.values()])
+
     def _get_cleared_fields(self, request):
         """
         Checks for any ImageField or FileField which have been cleared by user.
@@ -280,6 +664,117 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
             if input_name.endswith("-clear")
         ]
 
+    def _save_validated_form(self, request, form, formsets, new_object, add):
+        """
+        Save the form and formsets which were validated by _change_confirmation_view.
+
+        This code is taken from super()._changeform_view, which would otherwise build
+        and validate the form and formsets all over again.
+        https://github.com/django/django/blob/main/django/contrib/admin/options.py#L1894-L1905
+        """
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            self.save_model(request, new_object, form, not add)
+            self.save_related(request, form, formsets, not add)
+            change_message = self.construct_change_message(request, form, formsets, add)
+            if add:
+                self.log_addition(request, new_object, change_message)
+                return self.response_add(request, new_object)
+            self.log_change(request, new_object, change_message)
+            return self.response_change(request, new_object)
+
+    def _get_formsets_changed_data(self, request, obj, formsets, inline_instances):
+        """
+        The changes of the inline forms to show on confirmation, and whether they require it
+
+        Returns ({formset prefix: {form prefix: (changed data, title, changed confirmation fields)}}, bool)
+        """
+        is_confirmation_required = False
+        formsets_changed_data = {}
+        for formset, inline in zip(formsets, inline_instances):
+            # each formset corresponds to an inline in inline_instances
+            if not isinstance(inline, InlineAdminConfirmMixin):
+                continue
+
+            inline_confirmation_fields = inline.get_confirmation_fields(request, obj)
+            formset_changed_data = {}
+            for index, inline_form in enumerate(formset.forms):
+                form_changes, form_confirmation_required = self._get_inline_form_changed_data(
+                    inline, inline_form, index, inline_confirmation_fields
+                )
+                if form_changes:
+                    formset_changed_data[inline_form.prefix] = form_changes
+                is_confirmation_required = is_confirmation_required or form_confirmation_required
+            if formset_changed_data:
+                formsets_changed_data[formset.prefix] = formset_changed_data
+        return formsets_changed_data, is_confirmation_required
+
+    def _get_inline_form_changed_data(self, inline, inline_form, index, inline_confirmation_fields):
+        """
+        The (changed data, title, changed confirmation fields) of the inline form, or None when
+        it did not change, and whether it requires confirmation
+        """
+        if inline.confirm_delete and inline_form.cleaned_data.get("DELETE", False):
+            return ({}, f"DELETE {str(inline_form.instance)}", []), True
+
+        # Compares the raw data to the initial data, only changed forms need to be diffed
+        if not inline_form.has_changed():
+            return None, False
+
+        # form._meta.model
+        inline_add = inline_form.instance.id is None
+        form_changed_data = get_changed_data(inline_form)
+        if not form_changed_data:
+            return None, False
+
+        form_changed_confirmation_fields = set(inline_confirmation_fields) & set(form_changed_data.keys())
+        title = str(inline_form.instance) if not inline_add else f"#{index + 1}"
+        log(
+            f"Inline confirmation fields are {inline_confirmation_fields} "
+            f"and changed data fields are {form_changed_data.keys()}"
+        )
+        is_confirmation_required = bool(form_changed_confirmation_fields) and (
+            (inline_add and inline.confirm_add) or (not inline_add and inline.confirm_change)
+        )
+        return (form_changed_data, title, form_changed_confirmation_fields), is_confirmation_required
+
+    def _stage_confirmation(self, request, form, new_object, form_object_id):
+        """
+        Cache what the confirmation needs to be received: the POST when cache_confirmation_post
+        is set, and the object and files of a multipart form
+
+        Returns the confirmation token and the file fields which were cleared
+        """
+        # Namespace the cached data so that concurrent confirmations do not overwrite each other
+        confirmation_token = secrets.token_urlsafe(16)
+        namespace = get_confirmation_namespace(request, confirmation_token)
+        staged = {}
+        cleared_fields = []
+
+        if self.cache_confirmation_post:
+            log("Caching POST")
+            staged[format_namespaced_key(CACHE_KEYS["post"], namespace)] = self._get_post_to_cache(
+                request, new_object
+            )
+
+        if form.is_multipart():
+            log("Caching files")
+            staged[format_namespaced_key(CACHE_KEYS["object"], namespace)] = serialize_object(new_object)
+
+            # Save files as tempfiles, all in one round-trip
+            self._file_cache.set_many(
+                {
+                    format_cache_key(model=self.model.__name__, field=field_name, namespace=namespace): file
+                    for field_name, file in request.FILES.items()
+                }
+            )
+
+            # Handle when files are cleared - since the `form` object would not hold that info
+            cleared_fields = self._get_cleared_fields(request)
+
+        cache.set_many(staged, CACHE_TIMEOUT)
+        self._add_pending_confirmation(request, namespace, form_object_id)
+        return confirmation_token, cleared_fields
+
     def _change_confirmation_view(self, request, object_id, form_url, extra_context):
         # This code is taken from super()._changeform_view
         # https://github.com/django/django/blob/master/django/contrib/admin/options.py#L1575-L1592
@@ -290,6 +785,8 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
         model = self.model
         opts = model._meta
 
+        # The object whose change form was submitted, even when saving as new
+        form_object_id = object_id
         if SAVE_AS_NEW in request.POST:
             object_id = None
 
@@ -351,57 +848,17 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
                 or (not add_or_new and self.confirm_change)
             )
 
-        formsets_changed_data = {}  # Key: prefix, Value: list[dict[field, [initial, new]]]]
-        for formset, inline in zip(formsets, inline_instances):
-            # each formset corresponds to an inline in inline_instances
-            if not isinstance(inline, InlineAdminConfirmMixin):
-                continue
-
-            inline_confirmation_fields = inline.get_confirmation_fields(request, obj)
-
-            # formset.model
-            formset_changed_data = {}
-            for index, inline_form in enumerate(formset.forms):
-                inline_delete = inline_form.cleaned_data.get("DELETE", False)
-                if inline_delete and inline.confirm_delete:
-                    formset_changed_data[inline_form.prefix] = (
-                        {},
-                        f"DELETE {str(inline_form.instance)}",
-                        [],
-                    )
-                    is_confirmation_required = True
-                    continue
-
-                # form._meta.model
-                inline_add = inline_form.instance.id is None
-                form_changed_data = get_changed_data(inline_form)
-                if form_changed_data:
-                    form_changed_confirmation_fields = set(inline_confirmation_fields) & set(
-                        form_changed_data.keys()
-                    )
-                    title = str(inline_form.instance) if not inline_add else f"#{index + 1}"
-                    log(
-                        f"Inline confirmation fields are {inline_confirmation_fields} "
-                        f"and changed data fields are {form_changed_data.keys()}"
-                    )
-                    formset_changed_data[inline_form.prefix] = (
-                        form_changed_data,
-                        title,
-                        form_changed_confirmation_fields,
-                    )
-                    if form_changed_confirmation_fields:
-                        is_confirmation_required = (
-                            is_confirmation_required
-                            or (inline_add and inline.confirm_add)
-                            or (not inline_add and inline.confirm_change)
-                        )
-            if formset_changed_data:
-                formsets_changed_data[formset.prefix] = formset_changed_data
+        formsets_changed_data, inline_confirmation_required = self._get_formsets_changed_data(
+            request, obj, formsets, inline_instances
+        )
+        is_confirmation_required = is_confirmation_required or inline_confirmation_required
 
         if not is_confirmation_required:
             log("No change detected")
             # No confirmation required for changed fields, continue to save
-            return super()._changeform_view(request, object_id, form_url, extra_context)
+            if not add and not self.has_change_permission(request, obj):
+                raise PermissionDenied
+            return self._save_validated_form(request, form, formsets, new_object, add)
 
         # Confirmation page renders the bound form inside a hidden container.
         # Keep browser validation from blocking submit on hidden required controls;
@@ -422,17 +879,16 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
                 break
 
         cleared_fields = []
-        if form.is_multipart():
-            log("Caching files")
-            cache.set(CACHE_KEYS["object"], new_object, CACHE_TIMEOUT)
+        confirmation_token = None
+        if form.is_multipart() or self.cache_confirmation_post:
+            confirmation_token, cleared_fields = self._stage_confirmation(request, form, new_object, form_object_id)
 
-            # Save files as tempfiles
-            for field_name in request.FILES:
-                file = request.FILES[field_name]
-                self._file_cache.set(format_cache_key(model=model.__name__, field=field_name), file)
-
-            # Handle when files are cleared - since the `form` object would not hold that info
-            cleared_fields = self._get_cleared_fields(request)
+        hidden_inputs = None
+        hidden_formsets = []
+        if self.confirmation_form_as_hidden_inputs and not self.cache_confirmation_post:
+            hidden_inputs = self._get_hidden_inputs(request, new_object)
+        elif not self.cache_confirmation_post:
+            hidden_formsets = self._get_hidden_formsets(request, formsets)
 
         log("Render Change Confirmation")
         title_action = _("adding") if add_or_new else _("changing")
@@ -453,21 +909,44 @@ class AdminConfirmMixin(BaseAdminConfirmMixin):
             "submit_name": save_action,
             "form": form,
             "cleared_fields": cleared_fields,
+            "hidden_inputs": hidden_inputs,
+            "confirmation_token": confirmation_token,
+            "post_cached": self.cache_confirmation_post,
             "formsets": formsets,
+            "hidden_formsets": hidden_formsets,
             "confirmation_fields": changed_confirmation_fields,
             **(extra_context or {}),
         }
         return self.render_change_confirmation(request, context)
 
 
-def confirm_action(func):
+def confirm_action(func=None, *, chunk_size=None, dry_run=False, queued=False):
     """
     @confirm_action function wrapper for Django ModelAdmin actions
     Will redirect to a confirmation page to ask for confirmation
 
     Next, it would call the action if confirmed. Otherwise, it would
     return to the changelist without performing action.
+
+    @confirm_action(chunk_size=1000) calls the confirmed action once per chunk
+    of at most 1000 objects instead, each in its own transaction unless the
+    request already runs in one (ATOMIC_REQUESTS), and the confirmation page
+    shows the progress while the action runs.
+
+    @confirm_action(dry_run=True) runs the action in a transaction which is
+    rolled back while building the confirmation page, which then shows the
+    number of queries, the rows affected and the time it took.
+
+    @confirm_action(queued=True) queues the confirmed action instead, to be
+    run outside of the request by the workers of admin_confirm.worker.
     """
+    if func is None:
+        return functools.partial(confirm_action, chunk_size=chunk_size, dry_run=dry_run, queued=queued)
+
+    def run(func, modeladmin, request, queryset, namespace=None):
+        if chunk_size:
+            return run_in_chunks(func, modeladmin, request, queryset, chunk_size, namespace)
+        return func(modeladmin, request, queryset)
 
     @functools.wraps(func)
     def func_wrapper(modeladmin, request, queryset):
@@ -475,31 +954,264 @@ def confirm_action(func):
 
         # First called by `Go` which would not have confirm_action in params
         if request.POST.get("_confirm_action"):
-            return func(modeladmin, request, queryset)
+            queryset = _get_confirmed_selection(modeladmin, request, queryset, action_name)
+            if queryset is None:
+                return None
+            if queued:
+                return _queue_action(modeladmin, request, queryset, action_name)
+            namespace = get_confirmation_namespace(request, request.POST.get(ACTION_PROGRESS_TOKEN))
+            return run(func, modeladmin, request, queryset, namespace)
+
+        context = _get_action_confirmation_context(func, modeladmin, request, queryset, action_name)
+        # Identifies the progress of a chunked execution, see admin_confirm.action_progress
+        context["progress_token"] = secrets.token_urlsafe(16) if chunk_size and not queued else None
+        context.update(_get_action_overview(modeladmin, request, queryset))
+        if dry_run and context["has_perm"]:
+            context["dry_run"] = run_dry(func, modeladmin, request, queryset, run)
 
-        # get_actions will only return the actions that are allowed
-        has_perm = modeladmin.get_actions(request).get(action_name) is not None
+        # Display confirmation page
+        return modeladmin.render_action_confirmation(request, context)
 
-        action_tuple = modeladmin.get_action(action_name)
-        if action_tuple:
-            __, __, action_display_name = action_tuple
-        else:
-            action_display_name = getattr(func, "short_description", func.__name__)
+    # Called by the workers of admin_confirm.worker to run a queued action
+    func_wrapper.run_confirmed = functools.partial(run, func)
+    return func_wrapper
 
-        title = f"{_('Confirm Action')}: {action_display_name}"
 
-        context = {
-            **modeladmin.admin_site.each_context(request),
-            "title": title,
-            "queryset": queryset,
-            "has_perm": has_perm,
-            "action": action_name,
-            "action_display_name": action_display_name,
-            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
-            "submit_name": "confirm_action",
-        }
+def _get_confirmed_selection(modeladmin, request, queryset, action_name):
+    "The queryset narrowed down to the selection token posted back, if any, or None if it was altered"
+    selection_token = request.POST.get(ACTION_SELECTION_TOKEN)
+    if not selection_token:
+        return queryset
+    try:
+        return queryset.filter(loads_selection(selection_token, queryset.model, action_name))
+    except signing.BadSignature:
+        modeladmin.message_user(
+            request,
+            _("The selection could not be verified, please select the items again."),
+            messages.ERROR,
+        )
+        return None
+
+
+def _get_action_confirmation_context(func, modeladmin, request, queryset, action_name):
+    has_perm = get_allowed_action(modeladmin, request, action_name) is not None
+
+    action_tuple = modeladmin.get_action(action_name)
+    if action_tuple:
+        __, __, action_display_name = action_tuple
+    else:
+        action_display_name = getattr(func, "short_description", func.__name__)
+
+    # The selection is posted back as it was submitted, ie. the pks checked on the changelist page.
+    # When "select all" was used, Django rebuilds the queryset from the changelist filters
+    # in the query string on confirmation, so the selected objects are never all posted back.
+    select_across = request.POST.get("select_across") == "1"
+    selected_pks = request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+
+    selection_token = None
+    if selected_pks and not select_across and getattr(modeladmin, "action_selection_as_token", False):
+        selection_token = _get_selection_token(queryset, selected_pks, action_name)
+    if selection_token:
+        # Django only hands the changelist queryset to the action when something is selected,
+        # which is then narrowed down to the selection of the token
+        selected_pks = selected_pks[:1]
+
+    return {
+        **modeladmin.admin_site.each_context(request),
+        "title": f"{_('Confirm Action')}: {action_display_name}",
+        "queryset": queryset,
+        "has_perm": has_perm,
+        "action": action_name,
+        "action_display_name": action_display_name,
+        "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        "select_across": select_across,
+        "selected_pks": selected_pks,
+        "selection_token": selection_token,
+        "selection_token_name": ACTION_SELECTION_TOKEN,
+        "progress_token_name": ACTION_PROGRESS_TOKEN,
+        "submit_name": "confirm_action",
+    }
+
+
+def _get_selection_token(queryset, selected_pks, action_name):
+    pk_field = queryset.model._meta.pk
+    with suppress(ValidationError):
+        return dumps_selection([pk_field.to_python(pk) for pk in selected_pks], queryset.model, action_name)
+    return None
+
+
+def _get_action_overview(modeladmin, request, queryset):
+    "The preview and the summary of the selection, as configured on the admin"
+    overview = {}
+    preview_limit = getattr(modeladmin, "action_confirmation_preview_limit", None)
+    preview_fields = getattr(modeladmin, "action_confirmation_preview_fields", None)
+    if preview_limit is not None or preview_fields:
+        overview.update(_get_action_preview(queryset, preview_limit, preview_fields))
+
+    summary_fields = getattr(modeladmin, "action_confirmation_summary_fields", None)
+    summary_sums = getattr(modeladmin, "action_confirmation_summary_sums", None)
+    if summary_fields is True:
+        summary_fields = _get_list_filter_fields(modeladmin, request)
+    if summary_fields or summary_sums:
+        summary_limit = getattr(modeladmin, "action_confirmation_summary_limit", None)
+        overview["summary"] = _get_action_summary(queryset, summary_fields or [], summary_sums or [], summary_limit)
+    return overview
+
+
+def get_request_memo(request, owner, name):
+    "Dict memoizing `name` for `owner` for the lifetime of the request"
+    if not hasattr(request, "_admin_confirm_memo"):
+        request._admin_confirm_memo = {}
+    return request._admin_confirm_memo.setdefault((owner, name), {})
+
+
+def get_allowed_action(modeladmin, request, action_name):
+    """
+    The (func, name, description) of the action if it is allowed for the request, else None
 
-        # Display confirmation page
-        return modeladmin.render_action_confirmation(request, context)
+    Same as `modeladmin.get_actions(request).get(action_name)`, but only resolves the requested
+    action and checks its permissions, instead of those of every action. Memoized on the request.
+    """
+    actions = get_request_memo(request, modeladmin, "allowed_actions")
+    if action_name not in actions:
+        actions[action_name] = _resolve_allowed_action(modeladmin, request, action_name)
+    return actions[action_name]
+
+
+def _resolve_allowed_action(modeladmin, request, action_name):
+    if type(modeladmin).get_actions is not ModelAdmin.get_actions:
+        # The actions are customized, so only get_actions can tell
+        return modeladmin.get_actions(request).get(action_name)
+    if modeladmin.actions is None or IS_POPUP_VAR in request.GET:
+        return None
+
+    action = _get_action(modeladmin, action_name)
+    if action is None:
+        return None
+    # As in ModelAdmin.get_actions, an action declaring allowed_permissions needs any one of them
+    if not hasattr(action[0], "allowed_permissions"):
+        return action
+    permission_checks = (
+        getattr(modeladmin, f"has_{permission}_permission") for permission in action[0].allowed_permissions
+    )
+    if any(has_permission(request) for has_permission in permission_checks):
+        return action
+    return None
+
+
+def _get_action(modeladmin, action_name):
+    "The action of the admin with that name, else the enabled action of its site with that name"
+    for action in modeladmin.actions:
+        if action == action_name or getattr(action, "__name__", None) == action_name:
+            return modeladmin.get_action(action)
+    if action_name in dict(modeladmin.admin_site.actions):
+        return modeladmin.get_action(action_name)
+    return None
+
+
+def _queue_action(modeladmin, request, queryset, action_name):
+    """
+    Queue the confirmed action on the selection, and redirect to its status page
 
-    return func_wrapper
+    The selected pks are stored rather than the changelist filters, so the action runs on the
+    objects which were confirmed.
+    """
+    opts = modeladmin.model._meta
+    job_id = get_queue_backend().enqueue(
+        admin_site=modeladmin.admin_site.name,
+        model=opts.label_lower,
+        action=action_name,
+        selection=encode_pks(queryset.values_list("pk", flat=True)),
+        user_id=request.user.pk,
+    )
+    modeladmin.message_user(request, _("The action was queued and will run shortly."), messages.SUCCESS)
+    try:
+        return HttpResponseRedirect(
+            reverse(f"{modeladmin.admin_site.name}:{opts.app_label}_{opts.model_name}_queued_action", args=[job_id])
+        )
+    except NoReverseMatch:
+        # The status page is only available on admins using AdminConfirmMixin
+        return None
+
+
+def _get_action_preview(queryset, limit=None, fields=None):
+    """
+    The number of selected objects and the first `limit` of them (all if not set), without loading
+    the whole selection. With `fields`, objects are tuples of the values of the fields.
+    """
+    if fields:
+        # Related fields are joined in the same query
+        queryset = queryset.values_list(*fields)
+    preview_objects = list(queryset if limit is None else queryset[:limit])
+    if limit is None or len(preview_objects) < limit:
+        count = len(preview_objects)
+    else:
+        count = queryset.count()
+
+    return {
+        "preview_objects": preview_objects,
+        "preview_fields": fields,
+        "preview_count": count,
+        "preview_remaining": count - len(preview_objects),
+    }
+
+
+def _get_list_filter_fields(modeladmin, request):
+    """
+    The fields filtered on by list_filter which have few distinct values, ie. with choices,
+    booleans and foreign keys, without the filters which aren't on a field
+    """
+    fields = [
+        list_filter[0] if isinstance(list_filter, (list, tuple)) else list_filter
+        for list_filter in modeladmin.get_list_filter(request)
+    ]
+    return [field for field in fields if isinstance(field, str) and _is_categorical(modeladmin.model, field)]
+
+
+def _is_categorical(model, path):
+    try:
+        field = get_fields_from_path(model, path)[-1]
+    except (FieldDoesNotExist, NotRelationField):
+        return False
+    # Reverse and many to many relations would count an object once per related object
+    return bool(getattr(field, "choices", None)) or field.many_to_one or field.one_to_one or isinstance(field, BooleanField)
+
+
+def _get_action_summary(queryset, fields, sums, limit=None):
+    """
+    Number of selected objects and totals of `sums`, for each combination of the values of `fields`
+
+    Computed in a single grouped query, the totals of the whole selection are added up from its rows.
+    Only the first `limit` groups are shown, the totals then being computed in a query of their own.
+    """
+    aggregates = {"summary_count": Count("pk")}
+    aggregates.update({f"summary_sum_{index}": Sum(field) for index, field in enumerate(sums)})
+    if fields:
+        grouped = queryset.order_by().values(*fields).annotate(**aggregates).order_by(*fields)
+        if limit is not None:
+            grouped = grouped[: limit + 1]
+    else:
+        grouped = [queryset.order_by().aggregate(**aggregates)]
+
+    rows = [[row[field] for field in fields] + [row[aggregate] for aggregate in aggregates] for row in grouped]
+    truncated = limit is not None and len(rows) > limit
+    if truncated:
+        rows = rows[:limit]
+        whole_selection = queryset.order_by().aggregate(**aggregates)
+        totals = [whole_selection[aggregate] or 0 for aggregate in aggregates]
+    else:
+        totals = [sum(row[len(fields) + index] or 0 for row in rows) for index in range(len(aggregates))]
+    headers = [_get_verbose_name(queryset.model, field) for field in fields]
+    headers.append(_("count"))
+    headers.extend(_get_verbose_name(queryset.model, field) for field in sums)
+    return {
+        "headers": headers,
+        "rows": rows if fields else [],
+        "totals": ([_("Total")] + [""] * (len(fields) - 1) if fields else []) + totals,
+        "truncated": truncated,
+    }
+
+
+def _get_verbose_name(model, path):
+    field = get_fields_from_path(model, path)[-1]
+    return getattr(field, "verbose_name", field.name)
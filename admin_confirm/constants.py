@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from django.conf import settings
 
 SAVE = "_save"
@@ -10,6 +13,14 @@ CONFIRM_ADD = "_confirm_add"
 CONFIRM_CHANGE = "_confirm_change"
 CONFIRM_DELETE = "_confirm_delete"
 CONFIRMATION_RECEIVED = "_confirmation_received"
+# Posted back by the confirmation page to identify the cached data of that confirmation
+CONFIRMATION_TOKEN = "_confirmation_token"
+
+# Posted back by the action confirmation page with the signed selection, see admin_confirm.selection
+ACTION_SELECTION_TOKEN = "_confirm_action_selection"
+
+# Posted back by the action confirmation page to identify the progress of a chunked execution
+ACTION_PROGRESS_TOKEN = "_confirm_action_progress"
 
 # This is the key used to pass in confirmation options to template context.
 # It determines which hidden inputs to include in the add/change page form,
@@ -22,7 +33,32 @@ CACHE_KEYS = {
     "object": "admin_confirm__confirmation_object",
     "post": "admin_confirm__confirmation_request_post",
 }
+ACTION_PROGRESS_CACHE_KEY = "admin_confirm__action_progress"
+# Session key tracking the confirmations which have data cached, so that cache purges
+# only happen when something was actually staged
+PENDING_CONFIRMATIONS_SESSION_KEY = "admin_confirm__pending_confirmations"
+PENDING_CONFIRMATIONS_LIMIT = 20
+# If False, saves on models without file fields never purge cached confirmation data
+PURGE_WITHOUT_FILE_FIELDS = getattr(settings, "ADMIN_CONFIRM_PURGE_WITHOUT_FILE_FIELDS", True)
 CACHE_KEY_PREFIX = getattr(settings, "ADMIN_CONFIRM_CACHE_KEY_PREFIX", "admin_confirm__file_cache")
+# Size in bytes of the chunks files are cached in. If not set, each file is cached as a single entry
+FILE_CACHE_CHUNK_SIZE = getattr(settings, "ADMIN_CONFIRM_FILE_CACHE_CHUNK_SIZE", None)
+# Files larger than this many bytes are spooled to FILE_CACHE_SPOOL_DIR and only their path is cached.
+# If not set, files are never spooled
+FILE_CACHE_SPOOL_THRESHOLD = getattr(settings, "ADMIN_CONFIRM_FILE_CACHE_SPOOL_THRESHOLD", None)
+FILE_CACHE_SPOOL_DIR = getattr(
+    settings,
+    "ADMIN_CONFIRM_FILE_CACHE_SPOOL_DIR",
+    os.path.join(tempfile.gettempdir(), "admin_confirm"),
+)
 
+# Backend of the queue of actions confirmed with @confirm_action(queued=True), see admin_confirm.queue
+QUEUE_BACKEND = getattr(settings, "ADMIN_CONFIRM_QUEUE_BACKEND", "admin_confirm.queue.DatabaseQueueBackend")
+# Seconds idle workers wait before checking the queue again
+QUEUE_POLL_INTERVAL = getattr(settings, "ADMIN_CONFIRM_QUEUE_POLL_INTERVAL", 1)
+# Seconds between the heartbeats of a worker running an action
+QUEUE_HEARTBEAT_INTERVAL = getattr(settings, "ADMIN_CONFIRM_QUEUE_HEARTBEAT_INTERVAL", 30)
+# Seconds without heartbeat after which a running action is failed, its worker having stopped
+QUEUE_STALE_TIMEOUT = getattr(settings, "ADMIN_CONFIRM_QUEUE_STALE_TIMEOUT", 300)
 
 DEBUG = getattr(settings, "ADMIN_CONFIRM_DEBUG", False)
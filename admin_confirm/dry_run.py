@@ -0,0 +1,92 @@
+"""Dry run of a confirmed action, to estimate its cost before it is confirmed.
+
+An action confirmed with `@confirm_action(dry_run=True)` is run on the selection while
+the confirmation page is built, inside a transaction which is always rolled back.
+Its queries on the database of the model are counted, along with the rows they affected,
+and the wall time of the run is measured.
+
+Only the changes to the database are rolled back: side effects of the action outside of
+it, such as emails sent or files written, happen on the dry run too. Messages added by the
+action are discarded, as they would otherwise be shown on the confirmation page.
+"""
+
+import time
+from typing import Optional
+
+from django.contrib.messages.storage import default_storage
+from django.db import connections, router, transaction
+
+from admin_confirm.utils import log
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+# Issued by the transactions of the action itself, nested in the one of the dry run
+SAVEPOINT_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class DryRunRollback(Exception):
+    "Raised to roll back the transaction of the dry run once the action is done"
+
+
+class QueryCounter:
+    "Execute wrapper counting the queries, and the rows affected by those which write"
+
+    def __init__(self):
+        self.query_count = 0
+        self.rows_affected = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        statement = sql.lstrip().upper()
+        if statement.startswith(SAVEPOINT_STATEMENTS):
+            return result
+        self.query_count += 1
+        if statement.startswith(WRITE_STATEMENTS):
+            # rowcount is -1 when the backend cannot tell
+            self.rows_affected += max(context["cursor"].rowcount, 0)
+        return result
+
+
+def dry_run(func, modeladmin, request, queryset, run=None) -> dict:
+    """
+    Run the action on the queryset in a transaction which is always rolled back
+
+    `run(func, modeladmin, request, queryset)` calls the action, defaulting to calling it directly.
+    Returns the number of selected objects, of queries, of rows affected, the duration in
+    seconds, and the error raised by the action if any.
+    """
+    using = router.db_for_write(queryset.model)
+    selected_count = queryset.count()
+    counter = QueryCounter()
+    error: Optional[str] = None
+
+    messages_storage = getattr(request, "_messages", None)
+    if messages_storage is not None:
+        request._messages = default_storage(request)
+    start = time.perf_counter()
+    try:
+        with transaction.atomic(using=using), connections[using].execute_wrapper(counter):
+            (run or _call)(func, modeladmin, request, queryset)
+            raise DryRunRollback()
+    except DryRunRollback:
+        pass
+    except Exception as e:
+        log(f"Dry run of {func.__name__} failed: {e}")
+        error = str(e) or e.__class__.__name__
+    finally:
+        duration = time.perf_counter() - start
+        if messages_storage is not None:
+            request._messages = messages_storage
+
+    return {
+        "selected_count": selected_count,
+        "query_count": counter.query_count,
+        "rows_affected": counter.rows_affected,
+        "duration": duration,
+        # More queries than selected objects usually means queries issued per object
+        "queries_per_object": selected_count > 1 and counter.query_count > selected_count,
+        "error": error,
+    }
+
+
+def _call(func, modeladmin, request, queryset):
+    return func(modeladmin, request, queryset)
@@ -0,0 +1,81 @@
+"""Precomputed plans of the fields relevant to confirmations.
+
+The fields of a model never change once the app registry is ready, so what is derived
+from them is computed once per model. The confirmation fields of an admin depend on
+its fieldsets, so they are computed once per model and fieldsets signature: when the
+fieldsets change, the signature changes and a new plan is built.
+
+The fieldsets are read from the `fieldsets` or `fields` of the admin when
+`get_fieldsets` is not overridden, without building a form. Otherwise they depend on
+the request and are given by `get_fieldsets(request, obj)`, which builds the form of
+the admin when neither is declared.
+"""
+
+import functools
+from typing import FrozenSet, NamedTuple, Optional, Tuple
+
+from django.contrib.admin.options import BaseModelAdmin
+from django.contrib.admin.utils import flatten_fieldsets
+from django.db.models import FileField, ImageField, Model
+
+from admin_confirm.utils import log
+
+# Distinct (confirmation fields, fieldsets) signatures kept per process
+CONFIRMATION_PLANS_LIMIT = 1024
+
+
+class ModelFieldPlan(NamedTuple):
+    # Names of all fields, including ManyToManyFields and reverse relations
+    field_names: FrozenSet[str]
+    file_fields: Tuple[str, ...]
+
+
+class ConfirmationFieldPlan(NamedTuple):
+    # Fields which trigger a confirmation, ie. configured and visible on the admin page
+    confirmation_fields: FrozenSet[str]
+
+
+@functools.lru_cache(maxsize=None)
+def get_model_field_plan(model: type[Model]) -> ModelFieldPlan:
+    fields = model._meta.get_fields()
+    return ModelFieldPlan(
+        field_names=frozenset(field.name for field in fields),
+        file_fields=tuple(
+            field.name for field in fields if isinstance(field, (FileField, ImageField))
+        ),
+    )
+
+
+def get_declared_admin_fields(model_admin) -> Optional[Tuple[str, ...]]:
+    """
+    The fields visible on the admin page as set on the admin, or None when only
+    `get_fieldsets(request, obj)` can tell
+    """
+    admin_class = type(model_admin)
+    if admin_class.get_fieldsets is not BaseModelAdmin.get_fieldsets:
+        return None
+    # Read from the admin rather than its class, as they may be set on the instance
+    if model_admin.fieldsets:
+        return tuple(flatten_fieldsets(model_admin.fieldsets))
+    if model_admin.fields and admin_class.get_fields is BaseModelAdmin.get_fields:
+        return tuple(flatten_fieldsets([(None, {"fields": model_admin.fields})]))
+    return None
+
+
+@functools.lru_cache(maxsize=CONFIRMATION_PLANS_LIMIT)
+def get_confirmation_field_plan(
+    model: type[Model],
+    confirmation_fields: Optional[Tuple[str, ...]],
+    admin_fields: Tuple[str, ...],
+) -> ConfirmationFieldPlan:
+    """
+    :param confirmation_fields: fields configured on the admin, or None for all fields
+    :param admin_fields: fields visible on the admin page, ie. the flattened fieldsets
+    """
+    model_plan = get_model_field_plan(model)
+    if confirmation_fields is None:
+        confirmation_fields = model_plan.field_names
+    # filter to valid fields which are visible on the admin page
+    fields = frozenset(confirmation_fields) & frozenset(admin_fields)
+    log(f"[Admin fields are {admin_fields} and confirmation fields are {confirmation_fields}")
+    return ConfirmationFieldPlan(confirmation_fields=fields)
@@ -28,7 +28,15 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from django.core.files.uploadedfile import InMemoryUploadedFile
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import suppress
+
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
 
 try:
     from cStringIO import StringIO as BytesIO  # noqa: WPS433
@@ -37,18 +45,121 @@ except ImportError:
 
 from django.core.cache import cache
 
-from admin_confirm.constants import CACHE_TIMEOUT
-from admin_confirm.utils import log
+from admin_confirm.constants import (
+    CACHE_TIMEOUT,
+    FILE_CACHE_CHUNK_SIZE,
+    FILE_CACHE_SPOOL_DIR,
+    FILE_CACHE_SPOOL_THRESHOLD,
+)
+from admin_confirm.utils import format_chunk_key, log
+
+
+class CachedChunksFile(io.RawIOBase):
+    """Read-only file object which lazily loads the chunks of a cached file.
+
+    Only the chunk containing the current position is held in memory.
+    """
+
+    def __init__(self, cache, key, chunk_count, chunk_size, size):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+        self.chunk_count = chunk_count
+        self.chunk_size = chunk_size
+        self.size = size
+        self._position = 0
+        self._chunk_index = None
+        self._chunk = b""
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        if self._position >= self.size:
+            return 0
+        index, offset = divmod(self._position, self.chunk_size)
+        data = self._load_chunk(index)[offset : offset + len(buffer)]  # noqa: E203
+        read = len(data)
+        buffer[:read] = data
+        self._position += read
+        return read
+
+    def _load_chunk(self, index):
+        if index != self._chunk_index:
+            chunk = self.cache.get(format_chunk_key(self.key, index))
+            if chunk is None:
+                raise OSError(f"Chunk {index} of {self.key} is missing from the cache")
+            self._chunk_index = index
+            self._chunk = chunk
+        return self._chunk
+
+
+class SpooledUploadedFile(UploadedFile):
+    """A file spooled to disk by FileCache.
+
+    Like TemporaryUploadedFile, it exposes temporary_file_path() so that storages
+    can move the file into place instead of copying its content.
+    """
+
+    def __init__(self, path, name, content_type, size, charset):
+        super().__init__(open(path, "rb"), name, content_type, size, charset)  # noqa: WPS515
+        self.path = path
+
+    def temporary_file_path(self):
+        "Return the full path of the spooled file."
+        return self.path
+
+    def close(self):
+        with suppress(FileNotFoundError):
+            return self.file.close()
 
 
 class FileCache:
     "Cache file data and retain the file upon confirmation."
 
     timeout = CACHE_TIMEOUT
+    # When set, files are cached as numbered chunks of this many bytes plus a manifest
+    chunk_size = FILE_CACHE_CHUNK_SIZE
+    # When set, files larger than this are spooled to spool_dir and only their path is cached
+    spool_threshold = FILE_CACHE_SPOOL_THRESHOLD
+    spool_dir = FILE_CACHE_SPOOL_DIR
+    # Most recent keys deleted by delete_all(), as a FileCache is shared by the requests of the process
+    cached_keys_limit = 1000
 
     def __init__(self):
         self.cache = cache
         self.cached_keys = []
+        self._keys_lock = threading.Lock()
+
+    def _track_keys(self, keys):
+        with self._keys_lock:
+            self.cached_keys.extend(keys)
+            del self.cached_keys[: -self.cached_keys_limit]
+
+    def _untrack_keys(self, keys):
+        keys = set(keys)
+        with self._keys_lock:
+            self.cached_keys = [key for key in self.cached_keys if key not in keys]
 
     def set(self, key, upload):
         """
@@ -57,20 +168,101 @@ class FileCache:
         :param key: cache key
         :param upload: file data
         """
-        try:  # noqa: WPS229
-            state = {
-                "name": upload.name,
-                "size": upload.size,
-                "content_type": upload.content_type,
-                "charset": upload.charset,
-                "content": upload.file.read(),
-            }
+        self.set_many({key: upload})
+
+    def set_many(self, uploads):
+        """
+        Set the data of several files to cache in a single round-trip
+        (chunks of chunked files are still cached one at a time)
+
+        :param uploads: dict of cache key to file data
+        """
+        states = {}
+        for key, upload in uploads.items():
+            try:
+                states[key] = self._get_state(key, upload)
+            except AttributeError:  # pragma: no cover
+                continue
+        # Issue #46 Redis Cache errs if we call set_many with empty data
+        if states:
+            self.cache.set_many(states, self.timeout)
+            log(f"Setting file cache with {', '.join(states)}")
+            self._track_keys(states)
+
+    def _get_state(self, key, upload):
+        "Get the state to cache for the upload, spooling or chunking its content as configured."
+        state = {
+            "name": upload.name,
+            "size": upload.size,
+            "content_type": upload.content_type,
+            "charset": upload.charset,
+        }
+        if self.spool_threshold is not None and upload.size > self.spool_threshold:
+            state["path"] = self._spool(upload)
+        elif self.chunk_size:
+            state["chunk_size"] = self.chunk_size
+            state["chunks"] = self._set_chunks(key, upload)
+        else:
+            state["content"] = upload.file.read()
             upload.file.seek(0)
-            self.cache.set(key, state, self.timeout)
-            log(f"Setting file cache with {key}")
-            self.cached_keys.append(key)
-        except AttributeError:  # pragma: no cover
-            pass  # noqa: WPS420
+        return state
+
+    def _set_chunks(self, key, upload):
+        """
+        Cache the upload one chunk at a time
+
+        :return: number of chunks cached
+        """
+        chunk_count = 0
+        for chunk in self._iter_chunks(upload):
+            chunk_key = format_chunk_key(key, chunk_count)
+            self.cache.set(chunk_key, chunk, self.timeout)
+            self._track_keys([chunk_key])
+            chunk_count += 1
+        upload.seek(0)
+        return chunk_count
+
+    def _spool(self, upload):
+        """
+        Copy the upload to a private file in spool_dir
+
+        :return: path of the spooled file
+        """
+        os.makedirs(self.spool_dir, mode=0o700, exist_ok=True)
+        self._remove_expired_spooled_files()
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(upload.name)[1], dir=self.spool_dir)
+        with os.fdopen(fd, "wb") as spooled_file:
+            if hasattr(upload, "temporary_file_path"):
+                # Already on disk: copy it without reading it into memory
+                with open(upload.temporary_file_path(), "rb") as temporary_file:
+                    shutil.copyfileobj(temporary_file, spooled_file)
+            else:
+                for chunk in upload.chunks():
+                    spooled_file.write(chunk)
+        upload.seek(0)
+        log(f"Spooled {upload.name} to {path}")
+        return path
+
+    def _remove_expired_spooled_files(self):
+        "Remove spooled files of confirmations which were never completed."
+        expiry = time.time() - self.timeout
+        for entry in os.scandir(self.spool_dir):
+            if entry.is_file() and entry.stat().st_mtime < expiry:
+                with suppress(FileNotFoundError):
+                    os.remove(entry.path)
+
+    def _iter_chunks(self, upload):
+        "Yield the upload in chunks of exactly chunk_size bytes (except the last one)."
+        pending = b""
+        for data in upload.chunks(self.chunk_size):
+            view = memoryview(pending + data if pending else data)
+            offset = 0
+            while len(view) - offset >= self.chunk_size:
+                yield bytes(view[offset : offset + self.chunk_size])  # noqa: E203
+                offset += self.chunk_size
+            pending = bytes(view[offset:])
+        if pending:
+            yield pending
 
     def get(self, key):
         """
@@ -79,9 +271,49 @@ class FileCache:
         :param key: cache key
         :return: File data
         """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Get the data of several files from cache in a single round-trip
+
+        :param keys: cache keys
+        :return: dict of cache key to file data, for the keys which were found
+        """
+        uploads = {}
+        for key, state in self.cache.get_many(keys).items():
+            upload = self._get_upload(key, state)
+            if upload is not None:
+                uploads[key] = upload
+        return uploads
+
+    def _get_upload(self, key, state):
+        "Rebuild the file from its cached state."
         upload = None
-        state = self.cache.get(key)
-        if state:
+        if state and "path" in state:
+            if os.path.exists(state["path"]):
+                upload = SpooledUploadedFile(
+                    path=state["path"],
+                    name=state["name"],
+                    content_type=state["content_type"],
+                    size=state["size"],
+                    charset=state["charset"],
+                )
+                log(f"Getting spooled file cache with {key}")
+            else:
+                log(f"Warning: spooled file {state['path']} for {key} no longer exists")
+        elif state and "chunks" in state:
+            upload = UploadedFile(
+                file=CachedChunksFile(
+                    self.cache, key, state["chunks"], state["chunk_size"], state["size"]
+                ),
+                name=state["name"],
+                content_type=state["content_type"],
+                size=state["size"],
+                charset=state["charset"],
+            )
+            log(f"Getting chunked file cache with {key}")
+        elif state:
             file = BytesIO()
             file.write(state["content"])
             upload = InMemoryUploadedFile(
@@ -102,14 +334,44 @@ class FileCache:
 
         :param key: cache key
         """
-        self.cache.delete(key)
-        self.cached_keys.remove(key)
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        """
+        Delete the data of several files from cache
+
+        The cached states are only read (one extra round-trip) when files may be
+        chunked or spooled, to find their chunks and spooled files.
+
+        :param keys: cache keys
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        if self.chunk_size or self.spool_threshold is not None:
+            for key, state in self.cache.get_many(keys).items():
+                self._remove_file_data(key, state)
+                if isinstance(state, dict) and "chunks" in state:
+                    keys += [format_chunk_key(key, index) for index in range(state["chunks"])]
+        self.cache.delete_many(keys)
+        self._untrack_keys(keys)
 
     def delete_all(self):
-        "Delete all cached file data from cache."
+        "Delete the most recently cached file data from cache."
+        with self._keys_lock:
+            keys, self.cached_keys = self.cached_keys, []
         # Issue #46 Redis Cache errs if we call delete_many with an empty list - fixed in Django 4.2
         # Note: set_many() should check for empty data in redis too.
         # See: https://github.com/django/django/commit/608ab043f75f1f9c094de57d2fd678f522bb8243
-        if self.cached_keys:
-            self.cache.delete_many(self.cached_keys)
-            self.cached_keys = []
+        if keys:
+            if self.spool_threshold is not None:
+                for key, state in self.cache.get_many(keys).items():
+                    self._remove_file_data(key, state)
+            self.cache.delete_many(keys)
+
+    def _remove_file_data(self, key, state):
+        "Remove file data kept outside of the cache."
+        if isinstance(state, dict) and "path" in state:
+            log(f"Removing spooled file for {key}")
+            with suppress(FileNotFoundError):
+                os.remove(state["path"])
@@ -1,7 +1,7 @@
 from contextlib import suppress
-from typing import Dict
-from django.db.models import FileField, ImageField
-from django.core.exceptions import FieldDoesNotExist
+from typing import Dict, Iterable, List, Mapping, Optional
+from django.db.models import Field, FileField, ImageField
+from django.core.exceptions import FieldDoesNotExist, ValidationError
 from django.forms import ModelForm
 from .exceptions import FormNotBoundException
 
@@ -49,12 +49,14 @@ def get_changed_data(form: ModelForm) -> Dict:
     changed_data = {}
     # Parse the changed data - Note that form.changed_data only returns
     # a list of the changed fields, not the old vs new values
-    for name, new_value in form.cleaned_data.items():
+    # Only the fields whose raw data changed are compared on their cleaned data
+    for name in form.changed_data:
         # Ignore custom fields
         with suppress(FieldDoesNotExist):
-            if name not in form.changed_data:
+            if name not in form.cleaned_data:
                 continue
 
+            new_value = form.cleaned_data[name]
             initial_value = form.initial.get(name)
             if initial_value == new_value:
                 continue
@@ -63,3 +65,44 @@ def get_changed_data(form: ModelForm) -> Dict:
             changed_data[name] = display_for_changed_data(field_object, initial_value, new_value)
 
     return changed_data
+
+
+def get_model_fields(model, names: Iterable[str]) -> Optional[List[Field]]:
+    """
+    The model fields of the confirmation fields, to be compared with raw_value_matches
+
+    Returns None when one of them is not a field of the model, eg. an extra field of the form
+    """
+    try:
+        return [model._meta.get_field(name) for name in names]
+    except FieldDoesNotExist:
+        return None
+
+
+def raw_value_matches(field: Field, key: str, data, files, values: Mapping) -> bool:
+    """
+    Whether the raw submitted value of the model field is its stored value, without
+    building or validating a form.
+
+    field - Model field
+    key - Name of the field's input, including the formset prefix if any
+    data, files - request.POST and request.FILES
+    values - Stored values by attname, and set of related pks (as str) by name for ManyToManyFields
+
+    Returns False whenever the raw data alone cannot tell, eg. for a widget split into several inputs.
+    """
+    if isinstance(field, (FileField, ImageField)):
+        # A file input is only submitted when a new file is uploaded
+        return key not in files and f"{key}-clear" not in data
+    if field.many_to_many:
+        return field.name in values and set(data.getlist(key)) == values[field.name]
+    if not field.concrete or key not in data or field.attname not in values:
+        return False
+
+    raw_value = data[key]
+    stored_value = values[field.attname]
+    if raw_value == "":
+        return stored_value in (None, "")
+    with suppress(ValidationError):
+        return field.to_python(raw_value) == stored_value
+    return False
@@ -0,0 +1,35 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from admin_confirm.worker import WorkerPool, run_next
+
+
+class Command(BaseCommand):
+    help = "Run the actions confirmed with @confirm_action(queued=True)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Number of worker threads")
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the queued actions one after the other, and exit once the queue is empty",
+        )
+
+    def handle(self, *args, workers, once, **options):
+        if once:
+            count = 0
+            while run_next():
+                count += 1
+            self.stdout.write(f"Ran {count} queued actions")
+            return
+
+        pool = WorkerPool(workers)
+        pool.start()
+        self.stdout.write(f"Started {workers} workers, press CTRL-C to stop")
+        signal.signal(signal.SIGTERM, lambda *args: pool.stopped.set())
+        try:
+            pool.stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        pool.stop()
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import models
+
+from admin_confirm.action_progress import DONE, FAILED, QUEUED, RUNNING
+
+
+class QueuedAction(models.Model):
+    """
+    A confirmed action waiting to be run, or run, outside of the request
+
+    Used by admin_confirm.queue.DatabaseQueueBackend
+    """
+
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    admin_site = models.CharField(max_length=100)
+    # Label of the model, eg. "market.shop"
+    model = models.CharField(max_length=200)
+    action = models.CharField(max_length=200)
+    # The selected pks, encoded by admin_confirm.selection.encode_pks
+    selection = models.JSONField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    messages = models.JSONField(default=list)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last time the worker running the action reported it was still running
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.action} on {self.model} ({self.status})"
@@ -0,0 +1,150 @@
+"""Queue of confirmed actions to be run outside of the request.
+
+An action confirmed with `@confirm_action(queued=True)` is not run by the request which
+confirms it. The selection is stored in the queue instead, to be run by the workers of
+admin_confirm.worker, and the user is sent to a status page following its execution.
+
+The backend of the queue is set with ADMIN_CONFIRM_QUEUE_BACKEND, defaulting to
+DatabaseQueueBackend which keeps the queue in the QueuedAction table, so no broker is needed.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Optional
+
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from admin_confirm.action_progress import FAILED, QUEUED, RUNNING
+from admin_confirm.constants import QUEUE_BACKEND
+
+# The action may have partly run, so it is not run again without the user confirming it again
+STALE_ERROR = "The worker running the action stopped before it finished"
+
+
+class BaseQueueBackend(ABC):
+    """
+    Interface of the queue backends
+
+    Jobs are dicts with the id, admin_site, model, action, selection and user_id of the
+    queued action. Those returned by get() also have its status, messages, error and timestamps.
+    """
+
+    @abstractmethod
+    def enqueue(self, *, admin_site: str, model: str, action: str, selection: list, user_id) -> str:
+        "Queue the action, returning the id of the job"
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self) -> Optional[dict]:
+        "Mark the oldest queued job as running and return it, or None when there is none"
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, job_id: str):
+        "Record that the job is still running"
+        raise NotImplementedError
+
+    @abstractmethod
+    def fail_stale(self, timeout: float) -> int:
+        """
+        Fail the running jobs without heartbeat for `timeout` seconds, their worker having stopped
+
+        Returns the number of jobs failed
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def finish(self, job_id: str, status: str, messages: list, error: str = ""):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+
+class DatabaseQueueBackend(BaseQueueBackend):
+    "Queue kept in the QueuedAction table"
+
+    # Number of queued jobs tried per query when claiming, in case others are claimed concurrently
+    claim_batch_size = 10
+
+    @property
+    def model(self):
+        # Imported here as admin_confirm is imported before the apps are ready
+        from admin_confirm.models import QueuedAction
+
+        return QueuedAction
+
+    def _as_job(self, queued_action) -> dict:
+        return {
+            "id": str(queued_action.pk),
+            "admin_site": queued_action.admin_site,
+            "model": queued_action.model,
+            "action": queued_action.action,
+            "selection": queued_action.selection,
+            "user_id": queued_action.user_id,
+        }
+
+    def enqueue(self, *, admin_site, model, action, selection, user_id):
+        queued_action = self.model.objects.create(
+            admin_site=admin_site, model=model, action=action, selection=selection, user_id=user_id
+        )
+        return str(queued_action.pk)
+
+    def claim(self):
+        while True:
+            pks = list(
+                self.model.objects.filter(status=QUEUED).order_by("pk").values_list("pk", flat=True)[
+                    : self.claim_batch_size
+                ]
+            )
+            if not pks:
+                return None
+            for pk in pks:
+                # Only one worker can switch the status from queued, so a job is never run twice
+                now = timezone.now()
+                claimed = self.model.objects.filter(pk=pk, status=QUEUED).update(
+                    status=RUNNING, started_at=now, heartbeat_at=now
+                )
+                if claimed:
+                    return self._as_job(self.model.objects.get(pk=pk))
+
+    def heartbeat(self, job_id):
+        self.model.objects.filter(pk=job_id, status=RUNNING).update(heartbeat_at=timezone.now())
+
+    def fail_stale(self, timeout):
+        now = timezone.now()
+        return self.model.objects.filter(
+            status=RUNNING, heartbeat_at__lt=now - timedelta(seconds=timeout)
+        ).update(status=FAILED, error=STALE_ERROR, finished_at=now)
+
+    def finish(self, job_id, status, messages, error=""):
+        self.model.objects.filter(pk=job_id).update(
+            status=status, messages=messages, error=error, finished_at=timezone.now()
+        )
+
+    def get(self, job_id):
+        try:
+            queued_action = self.model.objects.get(pk=job_id)
+        except (self.model.DoesNotExist, ValueError):
+            return None
+        return {
+            **self._as_job(queued_action),
+            "status": queued_action.status,
+            "messages": queued_action.messages,
+            "error": queued_action.error,
+            "created_at": queued_action.created_at,
+            "started_at": queued_action.started_at,
+            "heartbeat_at": queued_action.heartbeat_at,
+            "finished_at": queued_action.finished_at,
+        }
+
+
+def get_queue_backend() -> BaseQueueBackend:
+    return import_string(QUEUE_BACKEND)()
+
+
+def get_progress_namespace(job_id: str) -> str:
+    "Namespace of the progress of a queued chunked action, see admin_confirm.action_progress"
+    return f"queued_action__{job_id}"
@@ -0,0 +1,99 @@
+"""Signed, compact token of the objects selected for an action.
+
+The action confirmation page can post back a single token instead of one hidden input
+per selected object. Integer pks are sorted and encoded as ranges, each range being
+the gap from the end of the previous range and its length, so a contiguous selection
+of any size encodes to a couple of numbers. Other pks are kept as sorted strings.
+The token is compressed and signed, so it cannot be altered on the way back.
+"""
+
+from typing import Iterable, List
+
+from django.core import signing
+from django.db.models import Model, Q
+
+SALT = "admin_confirm.selection"
+RANGES = "r"
+VALUES = "v"
+# Range lookups of a decoded selection, beyond which its pks are filtered on in batches
+MAX_RANGES = 100
+# Pks per `in` lookup of a decoded selection
+IN_BATCH_SIZE = 1000
+
+
+def encode_pks(pks: Iterable) -> List:
+    """
+    Encode pks as [RANGES, [start, length, gap, length, ...]] when they are all integers,
+    or as [VALUES, [pk, ...]] otherwise
+    """
+    pks = sorted(set(pks))
+    if not all(isinstance(pk, int) for pk in pks):
+        return [VALUES, [str(pk) for pk in pks]]
+
+    encoded = []
+    previous_end = 0
+    for pk in pks:
+        if encoded and pk == previous_end + 1:
+            encoded[-1] += 1
+        else:
+            encoded.extend([pk - previous_end, 1])
+        previous_end = pk
+    return [RANGES, encoded]
+
+
+def decode_pks(encoded: List) -> Q:
+    """
+    Filter on the pks encoded by encode_pks, with a range lookup per run of consecutive pks
+
+    A fragmented selection has too many runs for a lookup each, as databases limit the depth
+    of the expression tree of a query, so its pks are then filtered on in batches instead.
+    """
+    kind, values = encoded
+    if kind == VALUES:
+        return _in_batches(values)
+
+    single_pks = []
+    ranges = []
+    end = 0
+    for gap, length in zip(values[::2], values[1::2]):
+        start = end + gap
+        end = start + length - 1
+        if length == 1:
+            single_pks.append(start)
+        else:
+            ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        single_pks.extend(pk for start, end in ranges for pk in range(start, end + 1))
+        ranges = []
+
+    selection = _in_batches(single_pks)
+    for pk_range in ranges:
+        selection |= Q(pk__range=pk_range)
+    return selection
+
+
+def _in_batches(pks: List) -> Q:
+    selection = Q(pk__in=pks[:IN_BATCH_SIZE])
+    for start in range(IN_BATCH_SIZE, len(pks), IN_BATCH_SIZE):
+        end = start + IN_BATCH_SIZE
+        selection |= Q(pk__in=pks[start:end])
+    return selection
+
+
+def dumps_selection(pks: Iterable, model: type[Model], action: str) -> str:
+    return signing.dumps(
+        [model._meta.label_lower, action, encode_pks(pks)], salt=SALT, compress=True
+    )
+
+
+def loads_selection(token: str, model: type[Model], action: str) -> Q:
+    """
+    Filter on the selection of the token
+
+    Raises signing.BadSignature if the token was altered, or was made for another model or action
+    """
+    label, token_action, encoded = signing.loads(token, salt=SALT)
+    if label != model._meta.label_lower or token_action != action:
+        raise signing.BadSignature("Selection was made for another action")
+    return decode_pks(encoded)
@@ -0,0 +1,49 @@
+"""Compact serialization of the object staged for confirmation.
+
+Only the values of the concrete fields are cached, along with the model label and
+whether the object is being added. Related objects, prefetched caches and the rest
+of the instance state are left out, so the cached payload grows with the number of
+fields rather than with the object graph.
+"""
+
+from typing import Optional, Tuple
+
+from django.db.models import FileField, Model
+
+from admin_confirm.utils import log
+
+
+def serialize_object(obj: Model) -> Tuple:
+    """
+    Serialize the concrete field values of the model instance
+
+    :return: tuple of (model label, adding, field values in concrete field order)
+    """
+    values = []
+    for field in obj._meta.concrete_fields:
+        value = getattr(obj, field.attname)
+        if isinstance(field, FileField):
+            # Only the name is kept, the file content is cached by the FileCache
+            value = value.name or None
+        values.append(value)
+    return (obj._meta.label_lower, obj._state.adding, tuple(values))
+
+
+def deserialize_object(payload, model) -> Optional[Model]:
+    """
+    Rebuild a model instance from the payload of serialize_object
+
+    :return: instance of model, or None if the payload is not for this model
+    """
+    if isinstance(payload, Model):
+        # Instances were cached as is by older versions
+        return payload if type(payload) is model else None
+
+    label, adding, values = payload
+    if label != model._meta.label_lower:
+        log(f"Warning: cached object {label} is not of type {model._meta.label_lower}")
+        return None
+
+    obj = model(*values)
+    obj._state.adding = adding
+    return obj
@@ -0,0 +1,31 @@
+'use strict';
+// Polls the progress of a chunked action while the confirmation is being submitted
+{
+    const POLL_INTERVAL = 1000;
+
+    function pollProgress(url, element) {
+        fetch(url, {credentials: 'same-origin'})
+            .then((response) => response.ok ? response.json() : null)
+            .then((progress) => {
+                if (progress) {
+                    element.textContent = `${progress.done} / ${progress.total} (${progress.status})`;
+                    element.classList.remove('hidden');
+                }
+                if (!progress || progress.status === 'running') {
+                    setTimeout(() => pollProgress(url, element), POLL_INTERVAL);
+                }
+            })
+            .catch(() => setTimeout(() => pollProgress(url, element), POLL_INTERVAL));
+    }
+
+    window.addEventListener('load', function() {
+        const form = document.getElementById('action-confirmation-form');
+        const element = document.getElementById('action-progress');
+        if (!form || !element) {
+            return;
+        }
+        form.addEventListener('submit', function() {
+            setTimeout(() => pollProgress(form.dataset.progressUrl, element), POLL_INTERVAL);
+        });
+    });
+}
@@ -0,0 +1,58 @@
+"""Test helpers for projects using admin_confirm.
+
+ConfirmationQueryBudgetMixin asserts that the confirmation steps of a ModelAdmin stay within
+the number of queries declared in its `confirmation_query_budget`, eg.
+
+    class MyModelAdmin(AdminConfirmMixin, ModelAdmin):
+        confirmation_query_budget = {"render": (10, 3), "submit": 12}
+
+    class MyModelAdminTest(ConfirmationQueryBudgetMixin, TestCase):
+        def test_confirmation_queries(self):
+            with self.assertConfirmationQueryBudget(MyModelAdmin, RENDER, inline_forms=2):
+                self.client.post(change_url, {**data, "_confirm_change": True})
+
+"render" is the budget of the request showing the confirmation page, and "submit" that of
+the request confirming it, for a change, an add or an action. A budget is either a number of
+queries, or a tuple of a number of queries and a number of queries per submitted inline form.
+"""
+
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+RENDER = "render"
+SUBMIT = "submit"
+
+
+def get_query_budget(admin_class, step: str, inline_forms: int = 0):
+    "Maximum number of queries of the step, or None if the admin declares no budget for it"
+    budget = (getattr(admin_class, "confirmation_query_budget", None) or {}).get(step)
+    if budget is None:
+        return None
+    if isinstance(budget, int):
+        return budget
+    queries, per_inline_form = budget
+    return queries + per_inline_form * inline_forms
+
+
+class ConfirmationQueryBudgetMixin:
+    "TestCase mixin asserting the queries of confirmation steps against the admin's budget"
+
+    @contextmanager
+    def assertConfirmationQueryBudget(self, admin_class, step: str, inline_forms: int = 0, using=DEFAULT_DB_ALIAS):
+        budget = get_query_budget(admin_class, step, inline_forms)
+        if budget is None:
+            self.fail(f"{admin_class.__name__}.confirmation_query_budget has no budget for {step}")
+
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+
+        query_count = len(context.captured_queries)
+        if query_count > budget:
+            queries = "\n".join(
+                f"{index}. {query['sql']}" for index, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f"{admin_class.__name__} {step} issued {query_count} queries, over its budget of {budget}:\n{queries}"
+            )
@@ -8,13 +8,19 @@ from django.test import TestCase, RequestFactory, LiveServerTestCase
 from django.contrib.auth.models import User
 from tests.test_project.settings import SELENIUM_HOST
 
+from admin_confirm.admin import AdminConfirmMixin
+from admin_confirm.constants import CACHE_KEYS
+from admin_confirm.serialization import deserialize_object
+from admin_confirm.testing import ConfirmationQueryBudgetMixin
+from admin_confirm.utils import format_namespaced_key, get_confirmation_namespace
+
 from selenium import webdriver
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.common.by import By
 
 
-class AdminConfirmTestCase(TestCase):
+class AdminConfirmTestCase(ConfirmationQueryBudgetMixin, TestCase):
     """
     Helper TestCase class and common associated assertions
     """
@@ -27,6 +33,7 @@ class AdminConfirmTestCase(TestCase):
 
     def setUp(self):
         cache.clear()
+        AdminConfirmMixin._file_cache.cached_keys = []
         self.client.force_login(self.superuser)
         self.factory = RequestFactory()
         self.exit_stack = ExitStack()
@@ -42,6 +49,19 @@ class AdminConfirmTestCase(TestCase):
         for attr, value in attrs.items():
             self.exit_stack.enter_context(mock.patch.object(admin, attr, value))
 
+    def _getConfirmationToken(self, response):
+        return response.context_data.get("confirmation_token")
+
+    def _getCachedObject(self, response):
+        """
+        Get the object cached for the confirmation page in the response
+        """
+        namespace = get_confirmation_namespace(
+            response.wsgi_request, self._getConfirmationToken(response)
+        )
+        payload = cache.get(format_namespaced_key(CACHE_KEYS["object"], namespace))
+        return payload and deserialize_object(payload, response.context_data["opts"].model)
+
     def _assertManyToManyFormHtml(self, rendered_content, options, selected_ids):
         # Form data should be embedded and hidden on confirmation page
         # Should have the correct ManyToMany options selected
@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from admin_confirm import action_progress
+from admin_confirm.action_progress import DONE, FAILED, get_progress, iter_chunks, run_in_chunks
+from admin_confirm.tests.helpers import AdminConfirmTestCase
+from admin_confirm.utils import get_confirmation_namespace
+from tests.factories import ShopFactory
+from tests.market.models import Shop
+
+
+class TestActionProgress(AdminConfirmTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_iter_chunks_should_split_by_pk_ranges(self):
+        shops = [ShopFactory() for i in range(5)]
+        # A gap in the selection is not part of any chunk
+        queryset = Shop.objects.exclude(pk=shops[1].pk)
+
+        chunks = [list(chunk.values_list("pk", flat=True)) for chunk in iter_chunks(queryset, 2)]
+
+        self.assertEqual(
+            chunks, [[shops[0].pk, shops[2].pk], [shops[3].pk, shops[4].pk]]
+        )
+
+    def test_run_in_chunks_should_record_failure(self):
+        [ShopFactory() for i in range(3)]
+
+        def failing_action(modeladmin, request, queryset):
+            if queryset.filter(pk=Shop.objects.last().pk).exists():
+                raise ValueError("Failed")
+
+        with self.assertRaises(ValueError):
+            run_in_chunks(failing_action, None, None, Shop.objects.all(), 2, "namespace")
+        self.assertEqual(get_progress("namespace"), {"status": FAILED, "done": 2, "total": 3})
+
+    def test_run_in_chunks_should_warn_when_already_in_a_transaction(self):
+        ShopFactory()
+        # Test cases run in a transaction, as requests do with ATOMIC_REQUESTS
+        with mock.patch.object(action_progress, "log") as log:
+            run_in_chunks(lambda modeladmin, request, queryset: None, None, None, Shop.objects.all(), 2)
+        self.assertIn("is run in a transaction", log.call_args_list[0].args[0])
+
+    def test_confirmation_page_should_poll_progress_of_chunked_action(self):
+        shops = [ShopFactory() for i in range(3)]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message_in_chunks"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": [shop.pk for shop in shops],
+            },
+        )
+        token = response.context_data["progress_token"]
+        self.assertIsNotNone(token)
+        progress_url = reverse("admin:market_shop_action_progress", args=[token])
+        content = response.rendered_content
+        self.assertIn(f'data-progress-url="{progress_url}"', content)
+        self.assertIn(f'name="_confirm_action_progress" value="{token}"', content)
+        self.assertIn("admin/js/action_progress.js", content)
+
+    def test_confirmed_chunked_action_should_run_per_chunk_and_record_progress(self):
+        shops = [ShopFactory(name=f"shop {i}") for i in range(5)]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "_confirm_action": ["Yes, I'm sure"],
+                "action": ["show_message_in_chunks"],
+                "_selected_action": [shop.pk for shop in shops],
+                "_confirm_action_progress": "token",
+            },
+            follow=True,
+        )
+        messages = [str(message) for message in response.context["messages"]]
+        self.assertEqual(
+            messages,
+            ["Chunk: shop 0, shop 1", "Chunk: shop 2, shop 3", "Chunk: shop 4"],
+        )
+
+        progress_url = reverse("admin:market_shop_action_progress", args=["token"])
+        response = self.client.get(progress_url)
+        self.assertEqual(response.json(), {"status": DONE, "done": 5, "total": 5})
+
+        # The progress is only visible to the session which confirmed the action
+        namespace = get_confirmation_namespace(self.client, "token")
+        self.assertIsNotNone(get_progress(namespace))
+        self.client.logout()
+        self.client.force_login(self.superuser)
+        self.assertEqual(self.client.get(progress_url).status_code, 404)
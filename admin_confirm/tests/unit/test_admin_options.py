@@ -47,7 +47,7 @@ class TestAdminOptions(AdminConfirmTestCase):
         self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_continue")
 
         # Should not have cached the unsaved obj
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Should not have saved changes yet
@@ -113,7 +113,7 @@ class TestAdminOptions(AdminConfirmTestCase):
         self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_continue")
 
         # Should not have cached the unsaved obj
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Should not have saved changes yet
@@ -256,7 +256,7 @@ class TestAdminOptions(AdminConfirmTestCase):
         self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_continue")
 
         # Should not have cached the unsaved obj
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Should not have saved changes yet
@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from tests.benchmarks.runner import compare, measure
+from tests.factories import ShopFactory
+from tests.market.models import Shop
+
+
+class TestBenchmarks(TestCase):
+    def test_measure_should_count_queries_of_a_run(self):
+        ShopFactory.create_batch(2)
+        result = measure(lambda: [list(Shop.objects.all()), Shop.objects.count()], repeat=2)
+        self.assertEqual(result["queries"], 2)
+        self.assertEqual(result["repeat"], 2)
+        self.assertLessEqual(result["time_min"], result["time_median"])
+
+    def test_compare_should_report_slower_runs_and_more_queries(self):
+        baseline = {
+            "fast": {"time_median": 0.0001, "queries": 1},
+            "slow": {"time_median": 0.1, "queries": 3},
+            "queries": {"time_median": 0.1, "queries": 3},
+            "removed": {"time_median": 0.1, "queries": 3},
+        }
+        results = {
+            # Within the noise of fast benchmarks
+            "fast": {"time_median": 0.0003, "queries": 1},
+            "slow": {"time_median": 0.2, "queries": 3},
+            "queries": {"time_median": 0.05, "queries": 4},
+            "added": {"time_median": 1, "queries": 100},
+        }
+
+        self.assertEqual(
+            compare(results, baseline, threshold=0.25, min_delta=0.001),
+            ["slow: median time 100.00 ms -> 200.00 ms", "queries: queries 3 -> 4"],
+        )
+        self.assertEqual(len(compare(results, baseline, threshold=0.25)), 3)
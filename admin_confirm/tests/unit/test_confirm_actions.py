@@ -1,13 +1,20 @@
+from unittest import mock
+from django.contrib import admin
+from django.contrib.admin.options import IS_POPUP_VAR, ModelAdmin
 from django.contrib.admin.sites import AdminSite
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import Permission, User
 from django.http import HttpResponse
 from django.urls import reverse
 
 
 from admin_confirm.tests.helpers import AdminConfirmTestCase
-from tests.market.admin import ShopAdmin
-from tests.market.models import Shop
+from tests.market.admin import InventoryAdmin, ShopAdmin
+from tests.market.models import Inventory, Shop
+from tests.factories import InventoryFactory, ShopFactory
 from admin_confirm import confirm_action
+from admin_confirm.admin import get_allowed_action
 
 
 class TestConfirmActions(AdminConfirmTestCase):
@@ -351,3 +358,374 @@ class TestConfirmActions(AdminConfirmTestCase):
         )
         self.assertNotIn("Confirm Action: Site wide no confirm action", response.rendered_content)
         self.assertIn("Did action:site wide no confirm action", response.rendered_content)
+
+    def test_action_preview_should_show_count_and_first_objects(self):
+        self.setAdminAttributes(ShopAdmin, action_confirmation_preview_limit=2)
+        shops = [ShopFactory(name=f"shop {i}") for i in range(5)]
+        selected = [str(shop.pk) for shop in shops]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": selected,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data["preview_count"], 5)
+        self.assertEqual(len(response.context_data["preview_objects"]), 2)
+        self.assertEqual(response.context_data["preview_remaining"], 3)
+
+        content = response.rendered_content
+        self.assertIn("on 5 Shops?", content)
+        self.assertIn("and 3 more", content)
+        for preview_object in response.context_data["preview_objects"]:
+            self.assertIn(f"<li>{preview_object}</li>", content)
+        self.assertEqual(content.count("<li>shop "), 2)
+        # The whole selection is still posted back on confirmation
+        for pk in selected:
+            self.assertIn(f'name="_selected_action" value="{pk}"', content)
+
+    def test_action_preview_should_not_count_small_selection(self):
+        self.setAdminAttributes(ShopAdmin, action_confirmation_preview_limit=10)
+        shops = [ShopFactory() for i in range(3)]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": [shop.pk for shop in shops],
+            },
+        )
+        self.assertEqual(response.context_data["preview_count"], 3)
+        self.assertEqual(response.context_data["preview_remaining"], 0)
+        self.assertNotIn("more", response.rendered_content)
+
+    def test_action_with_select_across_should_only_post_back_submitted_pks(self):
+        self.setAdminAttributes(ShopAdmin, action_confirmation_preview_limit=1)
+        shops = [ShopFactory() for i in range(3)]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message"],
+                "select_across": ["1"],
+                "index": ["0"],
+                "_selected_action": [shops[0].pk],
+            },
+        )
+        self.assertEqual(response.context_data["preview_count"], 3)
+        content = response.rendered_content
+        self.assertEqual(content.count('name="_selected_action"'), 1)
+        self.assertIn(f'name="_selected_action" value="{shops[0].pk}"', content)
+        self.assertIn('<input type="hidden" name="select_across" value="1">', content)
+        self.assertIn('<input type="hidden" name="index" value="0">', content)
+
+    def test_action_with_select_across_without_preview_should_only_post_back_submitted_pks(self):
+        shops = [ShopFactory() for i in range(3)]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message"],
+                "select_across": ["1"],
+                "index": ["0"],
+                "_selected_action": [shops[0].pk],
+            },
+        )
+        content = response.rendered_content
+        self.assertEqual(content.count('name="_selected_action"'), 1)
+        self.assertIn(f'name="_selected_action" value="{shops[0].pk}"', content)
+        self.assertIn('<input type="hidden" name="select_across" value="1">', content)
+
+    def test_confirm_action_with_select_across_should_rebuild_queryset_from_filters(self):
+        apple = ShopFactory(name="apple")
+        ShopFactory(name="apricot")
+        ShopFactory(name="banana")
+        # As posted by the confirmation page, to the changelist url with its filters
+        response = self.client.post(
+            reverse("admin:market_shop_changelist") + "?q=ap",
+            data={
+                "_confirm_action": ["Yes, I'm sure"],
+                "action": ["show_message"],
+                "select_across": ["1"],
+                "index": ["0"],
+                # Only the pks checked on the changelist page
+                "_selected_action": [apple.pk],
+            },
+            follow=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        messages = [str(message) for message in response.context["messages"]]
+        self.assertEqual(len(messages), 1)
+        self.assertIn("apple", messages[0])
+        self.assertIn("apricot", messages[0])
+        self.assertNotIn("banana", messages[0])
+
+    def test_action_selection_as_token_should_post_back_a_single_token(self):
+        self.setAdminAttributes(ShopAdmin, action_selection_as_token=True)
+        shops = [ShopFactory() for i in range(5)]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": [shop.pk for shop in shops],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        token = response.context_data["selection_token"]
+        self.assertIsNotNone(token)
+        content = response.rendered_content
+        self.assertIn(f'name="_confirm_action_selection" value="{token}"', content)
+        self.assertEqual(content.count('name="_selected_action"'), 1)
+        self.assertIn('<input type="hidden" name="select_across" value="1">', content)
+
+    def test_confirm_action_with_token_should_only_perform_on_selection(self):
+        self.setAdminAttributes(ShopAdmin, action_selection_as_token=True)
+        selected = [ShopFactory(name="apple"), ShopFactory(name="apricot")]
+        ShopFactory(name="banana")
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": [shop.pk for shop in selected],
+            },
+        )
+
+        # Click "Yes, I'm sure"
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "_confirm_action": ["Yes, I'm sure"],
+                "action": ["show_message"],
+                "select_across": ["1"],
+                "index": ["0"],
+                "_selected_action": [selected[0].pk],
+                "_confirm_action_selection": response.context_data["selection_token"],
+            },
+            follow=True,
+        )
+        messages = [str(message) for message in response.context["messages"]]
+        self.assertEqual(len(messages), 1)
+        self.assertIn("apple", messages[0])
+        self.assertIn("apricot", messages[0])
+        self.assertNotIn("banana", messages[0])
+
+    def test_confirm_action_with_altered_token_should_not_perform_action(self):
+        ShopFactory(name="apple")
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "_confirm_action": ["Yes, I'm sure"],
+                "action": ["show_message"],
+                "select_across": ["1"],
+                "index": ["0"],
+                "_selected_action": ["1"],
+                "_confirm_action_selection": "altered",
+            },
+            follow=True,
+        )
+        messages = [str(message) for message in response.context["messages"]]
+        self.assertEqual(
+            messages, ["The selection could not be verified, please select the items again."]
+        )
+
+    def test_action_preview_fields_should_not_load_instances(self):
+        self.setAdminAttributes(ShopAdmin, action_confirmation_preview_fields=["id", "name"])
+        shops = [ShopFactory(name=f"shop {i}") for i in range(3)]
+        with mock.patch.object(Shop, "__str__") as shop_str:
+            response = self.client.post(
+                reverse("admin:market_shop_changelist"),
+                data={
+                    "action": ["show_message"],
+                    "select_across": ["0"],
+                    "index": ["0"],
+                    "_selected_action": [shop.pk for shop in shops],
+                },
+            )
+            content = response.rendered_content
+            shop_str.assert_not_called()
+
+        self.assertEqual(response.context_data["preview_count"], 3)
+        self.assertCountEqual(
+            response.context_data["preview_objects"], [(shop.id, shop.name) for shop in shops]
+        )
+        for shop in shops:
+            self.assertIn(f"<li>{shop.id} - {shop.name}</li>", content)
+
+    def test_action_preview_fields_with_limit(self):
+        self.setAdminAttributes(
+            ShopAdmin,
+            action_confirmation_preview_fields=["name"],
+            action_confirmation_preview_limit=1,
+        )
+        shops = [ShopFactory(name=f"shop {i}") for i in range(3)]
+        response = self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["show_message"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": [shop.pk for shop in shops],
+            },
+        )
+        self.assertEqual(response.context_data["preview_count"], 3)
+        self.assertEqual(len(response.context_data["preview_objects"]), 1)
+        self.assertIn("and 2 more", response.rendered_content)
+
+    def _post_site_wide_confirm_action_on_inventory(self, inventories):
+        return self.client.post(
+            reverse("admin:market_inventory_changelist"),
+            data={
+                "action": ["site_wide_confirm_action"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": [inventory.pk for inventory in inventories],
+            },
+        )
+
+    def test_action_summary_should_group_and_sum_in_a_single_query(self):
+        self.setAdminAttributes(
+            InventoryAdmin,
+            action_confirmation_summary_fields=["shop__name"],
+            action_confirmation_summary_sums=["quantity"],
+            action_confirmation_preview_limit=0,
+        )
+        shops = [ShopFactory(name="shop a"), ShopFactory(name="shop b")]
+        inventories = [
+            InventoryFactory(shop=shops[0], quantity=1),
+            InventoryFactory(shop=shops[0], quantity=2),
+            InventoryFactory(shop=shops[1], quantity=10),
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post_site_wide_confirm_action_on_inventory(inventories)
+            content = response.rendered_content
+        summary_queries = [query for query in queries if "GROUP BY" in query["sql"]]
+        self.assertEqual(len(summary_queries), 1)
+
+        summary = response.context_data["summary"]
+        self.assertEqual(summary["headers"], ["name", "count", "quantity"])
+        self.assertEqual(summary["rows"], [["shop a", 2, 3], ["shop b", 1, 10]])
+        self.assertEqual(summary["totals"], ["Total", 3, 13])
+        self.assertIn('<table class="action-summary">', content)
+        self.assertIn("<td>shop a</td><td>2</td><td>3</td>", content)
+
+    def test_action_summary_should_default_to_list_filter(self):
+        self.setAdminAttributes(
+            InventoryAdmin, list_filter=["shop"], action_confirmation_summary_fields=True
+        )
+        shop = ShopFactory()
+        inventories = [InventoryFactory(shop=shop), InventoryFactory(shop=shop)]
+        response = self._post_site_wide_confirm_action_on_inventory(inventories)
+
+        summary = response.context_data["summary"]
+        self.assertEqual(summary["headers"], ["shop", "count"])
+        self.assertEqual(summary["rows"], [[shop.pk, 2]])
+
+    def test_action_summary_should_only_default_to_categorical_list_filters(self):
+        self.setAdminAttributes(
+            InventoryAdmin,
+            list_filter=["shop", "quantity", "notes", "item__name"],
+            action_confirmation_summary_fields=True,
+        )
+        shop = ShopFactory()
+        inventories = [InventoryFactory(shop=shop, quantity=index) for index in range(3)]
+        response = self._post_site_wide_confirm_action_on_inventory(inventories)
+
+        summary = response.context_data["summary"]
+        # Grouping on the quantities and notes would show a row per object
+        self.assertEqual(summary["headers"], ["shop", "count"])
+        self.assertEqual(summary["rows"], [[shop.pk, 3]])
+
+    def test_action_summary_should_only_show_limited_groups(self):
+        self.setAdminAttributes(
+            InventoryAdmin,
+            action_confirmation_summary_fields=["quantity"],
+            action_confirmation_summary_sums=["quantity"],
+            action_confirmation_summary_limit=2,
+        )
+        inventories = [InventoryFactory(quantity=index) for index in range(1, 5)]
+        response = self._post_site_wide_confirm_action_on_inventory(inventories)
+
+        summary = response.context_data["summary"]
+        self.assertTrue(summary["truncated"])
+        self.assertEqual(summary["rows"], [[1, 1, 1], [2, 1, 2]])
+        # The totals are still those of the whole selection
+        self.assertEqual(summary["totals"], ["Total", 4, 10])
+        self.assertIn("Only the first 2 groups are shown", response.rendered_content)
+
+    def test_action_summary_without_fields_should_only_total(self):
+        self.setAdminAttributes(InventoryAdmin, action_confirmation_summary_sums=["quantity"])
+        inventories = [InventoryFactory(quantity=4), InventoryFactory(quantity=5)]
+        response = self._post_site_wide_confirm_action_on_inventory(inventories)
+
+        summary = response.context_data["summary"]
+        self.assertEqual(summary["rows"], [])
+        self.assertEqual(summary["totals"], [2, 9])
+        self.assertEqual(Inventory.objects.count(), 2)
+
+    def test_allowed_action_should_match_get_actions(self):
+        def change_or_delete(modeladmin, request, queryset):
+            pass
+
+        change_or_delete.allowed_permissions = ("change", "delete")
+
+        def no_permission(modeladmin, request, queryset):
+            pass
+
+        no_permission.allowed_permissions = ()
+
+        class PermissionsShopAdmin(ShopAdmin):
+            actions = [*ShopAdmin.actions, change_or_delete, no_permission]
+
+        staff = User.objects.create_user(username="staff", password="pass", is_staff=True)
+        staff.user_permissions.add(*Permission.objects.filter(codename__in=["view_shop", "change_shop"]))
+        shop_admin = PermissionsShopAdmin(Shop, admin.site)
+        for user in [self.superuser, User.objects.get(pk=staff.pk)]:
+            request = self.factory.post("/")
+            request.user = user
+            actions = shop_admin.get_actions(request)
+            # Any one of the permissions allows the action, and none denies it
+            self.assertIn("change_or_delete", actions)
+            self.assertNotIn("no_permission", actions)
+            for action_name in [*actions, "show_message", "no_permission", "not_an_action", "get_queryset"]:
+                self.assertEqual(
+                    get_allowed_action(shop_admin, request, action_name),
+                    actions.get(action_name),
+                    (user, action_name),
+                )
+
+    def test_allowed_action_should_only_check_requested_action(self):
+        shop_admin = ShopAdmin(Shop, admin.site)
+        request = self.factory.post("/")
+        request.user = self.superuser
+        with mock.patch.object(
+            ShopAdmin, "get_action", autospec=True, side_effect=ModelAdmin.get_action
+        ) as get_action, mock.patch.object(
+            ShopAdmin, "has_delete_permission", autospec=True, return_value=True
+        ) as has_delete_permission:
+            get_allowed_action(shop_admin, request, "show_message")
+            self.assertIsNotNone(get_allowed_action(shop_admin, request, "show_message"))
+            self.assertIsNotNone(get_allowed_action(shop_admin, request, "show_description"))
+
+        # Each action was resolved alone, once for the request
+        self.assertEqual(
+            [call.args[1] for call in get_action.call_args_list], ["show_message", "show_description"]
+        )
+        # Only show_message requires the delete permission
+        has_delete_permission.assert_called_once()
+
+    def test_allowed_action_should_respect_popup_and_customized_actions(self):
+        shop_admin = ShopAdmin(Shop, admin.site)
+        request = self.factory.post(f"/?{IS_POPUP_VAR}=1")
+        request.user = self.superuser
+        self.assertIsNone(get_allowed_action(shop_admin, request, "show_message"))
+
+        request = self.factory.post("/")
+        request.user = self.superuser
+        with mock.patch.object(ShopAdmin, "get_actions", autospec=True, return_value={}):
+            self.assertIsNone(get_allowed_action(shop_admin, request, "show_message"))
@@ -1,6 +1,7 @@
 import pytest
 from unittest import mock
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Permission, User
+from django.contrib.admin import ModelAdmin
 from django.contrib.admin.sites import AdminSite
 from django.contrib.admin.options import TO_FIELD_VAR
 from django.http import HttpResponseForbidden, HttpResponseBadRequest
@@ -446,3 +447,157 @@ class TestConfirmChangeAndAdd(AdminConfirmTestCase):
 
         # Ensure that the confirmation form preserves changelist filters in the form action
         assert f'action="{url}"' in response.content.decode()
+
+    def test_object_should_be_loaded_once_per_request(self):
+        item = ItemFactory(name="bob", price=2)
+        data = {
+            "name": "bobby",
+            "price": 6,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "id": item.id,
+            "_confirm_change": True,
+            "_continue": True,
+        }
+        with mock.patch.object(
+            ModelAdmin, "get_object", autospec=True, side_effect=ModelAdmin.get_object
+        ) as get_object:
+            response = self.client.post(f"/admin/market/item/{item.id}/change/", data)
+            self.assertEqual(response.status_code, 200)
+            get_object.assert_called_once()
+
+            # Saving reuses the object loaded for the confirmation options
+            get_object.reset_mock()
+            del data["_confirm_change"]
+            response = self.client.post(f"/admin/market/item/{item.id}/change/", data)
+            self.assertEqual(response.status_code, 302)
+            get_object.assert_called_once()
+
+        item.refresh_from_db()
+        self.assertEqual(item.name, "bobby")
+
+    def test_add_should_not_load_an_object(self):
+        with mock.patch.object(ModelAdmin, "get_object") as get_object:
+            self.client.get(reverse("admin:market_item_add"))
+            get_object.assert_not_called()
+
+    def test_form_should_be_validated_once_when_no_confirmation_is_required(self):
+        self.setAdminAttributes(InventoryAdmin, confirmation_fields=["quantity"])
+
+        inventory = InventoryFactory()
+        another_shop = ShopFactory()
+        data = {
+            "quantity": inventory.quantity,
+            "id": inventory.id,
+            "item": inventory.item.id,
+            "shop": another_shop.id,
+            "_confirm_change": True,
+            "csrfmiddlewaretoken": "fake token",
+        }
+        with mock.patch.object(
+            ModelAdmin, "_create_formsets", autospec=True, side_effect=ModelAdmin._create_formsets
+        ) as create_formsets, mock.patch.object(
+            ModelAdmin, "log_change", autospec=True, side_effect=ModelAdmin.log_change
+        ) as log_change:
+            response = self.client.post(f"/admin/market/inventory/{inventory.id}/change/", data)
+            create_formsets.assert_called_once()
+            log_change.assert_called_once()
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse("admin:market_inventory_changelist"))
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.shop, another_shop)
+
+    def test_view_only_user_should_not_save_when_no_confirmation_is_required(self):
+        user = User.objects.create_user(username="user", is_staff=True)
+        user.user_permissions.add(Permission.objects.get(codename="view_inventory"))
+        self.client.force_login(user)
+        self.setAdminAttributes(InventoryAdmin, confirmation_fields=["quantity"])
+
+        inventory = InventoryFactory()
+        old_shop = inventory.shop
+        data = {
+            "quantity": inventory.quantity,
+            "id": inventory.id,
+            "item": inventory.item.id,
+            "shop": ShopFactory().id,
+            "_confirm_change": True,
+            "csrfmiddlewaretoken": "fake token",
+        }
+        response = self.client.post(f"/admin/market/inventory/{inventory.id}/change/", data)
+
+        self.assertEqual(response.status_code, 403)
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.shop, old_shop)
+
+    def test_precheck_should_save_without_building_the_confirmation_when_unchanged(self):
+        self.setAdminAttributes(ItemAdmin, confirmation_precheck=True)
+        item = ItemFactory(name="item")
+        data = {
+            "name": "name",
+            "price": str(item.price),
+            "currency": item.currency,
+            "id": item.id,
+            "_confirm_change": True,
+            "_save": True,
+        }
+        with mock.patch.object(ItemAdmin, "_change_confirmation_view") as confirmation_view:
+            response = self.client.post(f"/admin/market/item/{item.id}/change/", data)
+            confirmation_view.assert_not_called()
+
+        self.assertEqual(response.status_code, 302)
+        item.refresh_from_db()
+        self.assertEqual(item.name, "name")
+
+    def test_precheck_should_ask_for_confirmation_when_changed(self):
+        self.setAdminAttributes(ItemAdmin, confirmation_precheck=True)
+        item = ItemFactory(name="item", price=2)
+        data = {
+            "name": "item",
+            "price": "3.00",
+            "currency": item.currency,
+            "id": item.id,
+            "_confirm_change": True,
+            "_save": True,
+        }
+        response = self.client.post(f"/admin/market/item/{item.id}/change/", data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context_data["confirmation_fields"], {"price"})
+        item.refresh_from_db()
+        self.assertEqual(item.price, 2)
+
+    def test_invalid_form_should_be_shown_with_the_stored_object(self):
+        item = ItemFactory(name="item", price=2)
+        data = {
+            "name": "new name",
+            "price": "not a price",
+            "currency": item.currency,
+            "id": item.id,
+            "_confirm_change": True,
+            "_save": True,
+        }
+        response = self.client.post(f"/admin/market/item/{item.id}/change/", data)
+
+        self.assertEqual(response.status_code, 200)
+        form = response.context_data["adminform"].form
+        self.assertIn("price", form.errors)
+        # The form shown with the errors is not built on the object modified by the confirmation's form
+        self.assertEqual(form.initial["name"], "item")
+        self.assertEqual(form.changed_data, ["name", "price"])
+
+    def test_precheck_should_keep_confirmation_options_on_invalid_form(self):
+        self.setAdminAttributes(ItemAdmin, confirmation_precheck=True)
+        item = ItemFactory(name="item")
+        data = {
+            "price": str(item.price),
+            "currency": item.currency,
+            "id": item.id,
+            "_confirm_change": True,
+            "_save": True,
+        }
+        response = self.client.post(f"/admin/market/item/{item.id}/change/", data)
+
+        # The errors are shown, and confirmation is still asked for on the next submission
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("name", response.context_data["adminform"].form.errors)
+        self.assertIn("_confirm_change", response.context_data[CONFIRMATION_OPTIONS])
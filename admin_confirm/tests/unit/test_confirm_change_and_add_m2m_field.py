@@ -1,4 +1,6 @@
 from unittest import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.admin import AdminSite
 
@@ -72,6 +74,45 @@ class TestConfirmChangeAndAddM2MField(AdminConfirmTestCase):
         self.assertEqual(ShoppingMall.objects.count(), 1)
         self.assertEqual(ShoppingMall.objects.all().first().shops.count(), 3)
 
+    def test_post_add_with_confirm_add_m2m_as_hidden_inputs(self):
+        self.setAdminAttributes(
+            ShoppingMallAdmin,
+            confirmation_fields=["shops"],
+            confirmation_form_as_hidden_inputs=True,
+        )
+        shops = [ShopFactory() for i in range(3)]
+
+        data = {
+            "name": "name",
+            "shops": [s.id for s in shops[:2]],
+            "_confirm_add": True,
+            "_save": True,
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("admin:market_shoppingmall_add"), data)
+        self.assertEqual(response.status_code, 200)
+
+        # Should only embed the selected values, without rendering any choices
+        for shop in shops[:2]:
+            self.assertIn(
+                f'<input type="hidden" name="shops" value="{shop.id}">', response.rendered_content
+            )
+        self.assertNotIn(f'value="{shops[2].id}"', response.rendered_content)
+        self.assertNotIn("<option", response.rendered_content)
+        self._assertSubmitHtml(rendered_content=response.rendered_content)
+
+        # Should run fewer queries than rendering the full widgets
+        self.setAdminAttributes(ShoppingMallAdmin, confirmation_form_as_hidden_inputs=False)
+        with CaptureQueriesContext(connection) as widget_queries:
+            self.client.post(reverse("admin:market_shoppingmall_add"), data)
+        self.assertLess(len(queries), len(widget_queries))
+
+        # Selecting to "Yes, I'm sure" on the confirmation page
+        del data["_confirm_add"]
+        response = self.client.post(reverse("admin:market_shoppingmall_add"), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ShoppingMall.objects.get().shops.count(), 2)
+
     def test_m2m_field_post_change_with_confirm_change(self):
         shops = [ShopFactory() for i in range(10)]
         shopping_mall = ShoppingMall.objects.create(name="My Mall")
@@ -199,3 +240,31 @@ class TestConfirmChangeAndAddM2MField(AdminConfirmTestCase):
 
         # Assert that the M2M field 'shops' is included
         self.assertIn("shops", confirmation_fields)
+
+    def test_precheck_should_compare_m2m_field(self):
+        self.setAdminAttributes(
+            ShoppingMallAdmin, confirmation_fields=["shops"], confirmation_precheck=True
+        )
+        shops = [ShopFactory() for i in range(3)]
+        mall = ShoppingMall.objects.create(name="mall")
+        mall.shops.set(shops[:2])
+        data = {
+            "id": mall.id,
+            "name": "name",
+            "shops": [s.id for s in shops[:2]],
+            "_confirm_change": True,
+            "_save": True,
+        }
+        url = reverse("admin:market_shoppingmall_change", args=[mall.id])
+
+        # Same shops: saved without confirmation
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        mall.refresh_from_db()
+        self.assertEqual(mall.name, "name")
+
+        # Another shop: asks for confirmation
+        data["shops"] = [s.id for s in shops]
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mall.shops.count(), 2)
@@ -1,9 +1,13 @@
+from html.parser import HTMLParser
+from unittest import mock
 from django.contrib.auth.models import User
+from django.contrib.admin import ModelAdmin
 from django.contrib.admin.sites import AdminSite
 from django.http import HttpResponseForbidden
 from django.urls import reverse
 
-from admin_confirm.constants import CONFIRMATION_OPTIONS
+from admin_confirm import admin as admin_confirm_admin
+from admin_confirm.constants import CONFIRMATION_OPTIONS, CONFIRMATION_RECEIVED
 from admin_confirm.tests.helpers import AdminConfirmTestCase
 from tests.market.models import Consumer, Transaction
 from tests.market.admin.consumer_admin import ConsumerAdmin, TransactionInline
@@ -14,6 +18,39 @@ from tests.factories import (
 )
 
 
+class HiddenFormParser(HTMLParser):
+    "Collects the data a browser would submit from the hidden form of the confirmation page"
+
+    def __init__(self):
+        super().__init__()
+        self.data = {}
+        self.in_hidden_form = False
+        self.select_name = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if attrs.get("id") == "hidden-form":
+            self.in_hidden_form = True
+        if not self.in_hidden_form:
+            return
+        if tag == "input" and (attrs.get("type") != "checkbox" or "checked" in attrs):
+            self.data.setdefault(attrs["name"], []).append(attrs.get("value", ""))
+        elif tag == "select":
+            self.select_name = attrs["name"]
+        elif tag == "option" and "selected" in attrs:
+            self.data.setdefault(self.select_name, []).append(attrs["value"])
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self.in_hidden_form = False
+
+
+def get_hidden_form_data(rendered_content):
+    parser = HiddenFormParser()
+    parser.feed(rendered_content)
+    return parser.data
+
+
 class TestConfirmOnInlines(AdminConfirmTestCase):
     def setUp(self):
         super().setUp()
@@ -161,6 +198,46 @@ class TestConfirmOnInlines(AdminConfirmTestCase):
         # Should not have been added yet
         self.assertEqual(Transaction.objects.count(), 0)
 
+    def test_post_add_inline_with_confirm_add_as_hidden_inputs(self):
+        self.setAdminAttributes(TransactionInline, confirm_add=True)
+        self.setAdminAttributes(ConsumerAdmin, confirmation_form_as_hidden_inputs=True)
+        form_data = {
+            "name": self.consumer.name,
+            "email": self.consumer.email,
+            "transactions-TOTAL_FORMS": "1",
+            "transactions-INITIAL_FORMS": "0",
+            "transactions-MIN_NUM_FORMS": "0",
+            "transactions-MAX_NUM_FORMS": "1000",
+            "transactions-0-id": "",
+            "transactions-0-consumer": self.consumer.id,
+            "transactions-0-timestamp_0": self.transaction.timestamp.strftime("%Y-%m-%d"),
+            "transactions-0-timestamp_1": self.transaction.timestamp.strftime("%H:%M:%S"),
+            "transactions-0-total": str(self.transaction.total),
+            "transactions-0-currency": self.transaction.currency,
+            "transactions-0-shop": f"{self.shop.id}",
+            "transactions-0-date": self.transaction.date.strftime("%Y-%m-%d"),
+        }
+        data = {
+            **form_data,
+            "Transaction_confirm_add": True,
+            "_save": "Save",
+        }
+        response = self.client.post(
+            reverse("admin:market_consumer_change", args=[self.consumer.id]), data=data
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Form and formsets (with management forms) should only be embedded as hidden inputs
+        for name, value in form_data.items():
+            self.assertIn(
+                f'<input type="hidden" name="{name}" value="{value}">', response.rendered_content
+            )
+        self.assertNotIn("<select", response.rendered_content)
+        self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_save")
+
+        # Should not have been added yet
+        self.assertEqual(Transaction.objects.count(), 0)
+
     def test_post_inline_change_with_confirm_change(self):
         self.setAdminAttributes(TransactionInline, confirm_change=True)
         self.transaction.save()
@@ -660,3 +737,251 @@ class TestConfirmOnInlines(AdminConfirmTestCase):
         self.assertTrue(isinstance(response, HttpResponseForbidden))
         # Transaction not deleted
         self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_inline_instances_should_be_built_once_per_request(self):
+        self.setAdminAttributes(TransactionInline, confirm_change=True)
+        self.transaction.save()
+        data = {
+            "name": self.consumer.name,
+            "email": self.consumer.email,
+            "transactions-TOTAL_FORMS": "1",
+            "transactions-INITIAL_FORMS": "1",
+            "transactions-MIN_NUM_FORMS": "0",
+            "transactions-MAX_NUM_FORMS": "1000",
+            "transactions-0-id": self.transaction.id,
+            "transactions-0-consumer": self.consumer.id,
+            "transactions-0-timestamp_0": self.transaction.timestamp.strftime("%Y-%m-%d"),
+            "transactions-0-timestamp_1": self.transaction.timestamp.strftime("%H:%M:%S"),
+            "transactions-0-total": 999.00,  # Change total to trigger confirmation
+            "transactions-0-currency": self.transaction.currency,
+            "transactions-0-shop": f"{self.shop.id}",
+            "transactions-0-date": self.transaction.date.strftime("%Y-%m-%d"),
+            "Transaction_confirm_change": True,
+            "_save": "Save",
+        }
+        url = reverse("admin:market_consumer_change", args=[self.consumer.id])
+        with mock.patch.object(
+            ModelAdmin,
+            "get_inline_instances",
+            autospec=True,
+            side_effect=ModelAdmin.get_inline_instances,
+        ) as get_inline_instances:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            get_inline_instances.assert_called_once()
+
+            get_inline_instances.reset_mock()
+            response = self.client.post(url, data=data)
+            self.assertEqual(response.status_code, 200)
+            get_inline_instances.assert_called_once()
+
+            # Saving reuses the inlines built for the confirmation options
+            get_inline_instances.reset_mock()
+            del data["Transaction_confirm_change"]
+            response = self.client.post(url, data=data)
+            self.assertEqual(response.status_code, 302)
+            get_inline_instances.assert_called_once()
+
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.total, 999.00)
+
+    def test_precheck_should_compare_inline_rows(self):
+        self.setAdminAttributes(ConsumerAdmin, confirmation_precheck=True)
+        self.setAdminAttributes(TransactionInline, confirm_change=True, confirm_add=True)
+        self.transaction.save()
+        data = {
+            "name": "new name",
+            "email": self.consumer.email,
+            "transactions-TOTAL_FORMS": "1",
+            "transactions-INITIAL_FORMS": "1",
+            "transactions-MIN_NUM_FORMS": "0",
+            "transactions-MAX_NUM_FORMS": "1000",
+            "transactions-0-id": self.transaction.id,
+            "transactions-0-consumer": self.consumer.id,
+            "transactions-0-timestamp_0": self.transaction.timestamp.strftime("%Y-%m-%d"),
+            "transactions-0-timestamp_1": self.transaction.timestamp.strftime("%H:%M:%S"),
+            "transactions-0-total": str(self.transaction.total),
+            "transactions-0-currency": self.transaction.currency,
+            "transactions-0-shop": f"{self.shop.id}",
+            "transactions-0-date": self.transaction.date.strftime("%Y-%m-%d"),
+            "Transaction_confirm_change": True,
+            "Transaction_confirm_add": True,
+            "_save": "Save",
+        }
+        url = reverse("admin:market_consumer_change", args=[self.consumer.id])
+        self.setAdminAttributes(TransactionInline, confirmation_fields=["total", "shop"])
+
+        # Unchanged rows: saved without confirmation
+        with mock.patch.object(ConsumerAdmin, "_change_confirmation_view") as confirmation_view:
+            response = self.client.post(url, data=data)
+            confirmation_view.assert_not_called()
+        self.assertEqual(response.status_code, 302)
+        self.consumer.refresh_from_db()
+        self.assertEqual(self.consumer.name, "new name")
+
+        # Changed row: asks for confirmation
+        data["transactions-0-total"] = "999.00"
+        response = self.client.post(url, data=data)
+        self.assertEqual(response.status_code, 200)
+        self.transaction.refresh_from_db()
+        self.assertNotEqual(self.transaction.total, 999)
+
+        # New row: asks for confirmation
+        data["transactions-0-total"] = str(self.transaction.total)
+        data["transactions-TOTAL_FORMS"] = "2"
+        data["transactions-1-id"] = ""
+        data["transactions-1-consumer"] = self.consumer.id
+        data["transactions-1-total"] = "10.00"
+        response = self.client.post(url, data=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_precheck_should_skip_inline_rows_without_confirmation_fields(self):
+        self.setAdminAttributes(ConsumerAdmin, confirmation_precheck=True)
+        self.setAdminAttributes(TransactionInline, confirm_change=True, confirm_add=True)
+        self.transaction.save()
+        data = {
+            "name": "new name",
+            "email": self.consumer.email,
+            "transactions-TOTAL_FORMS": "1",
+            "transactions-INITIAL_FORMS": "1",
+            "transactions-MIN_NUM_FORMS": "0",
+            "transactions-MAX_NUM_FORMS": "1000",
+            "transactions-0-id": self.transaction.id,
+            "transactions-0-consumer": self.consumer.id,
+            "transactions-0-timestamp_0": self.transaction.timestamp.strftime("%Y-%m-%d"),
+            "transactions-0-timestamp_1": self.transaction.timestamp.strftime("%H:%M:%S"),
+            "transactions-0-total": "999.00",
+            "transactions-0-currency": self.transaction.currency,
+            "transactions-0-shop": f"{self.shop.id}",
+            "transactions-0-date": self.transaction.date.strftime("%Y-%m-%d"),
+            "Transaction_confirm_change": True,
+            "Transaction_confirm_add": True,
+            "_save": "Save",
+        }
+        url = reverse("admin:market_consumer_change", args=[self.consumer.id])
+
+        # No visible confirmation field on the inline: no row change is confirmed
+        with mock.patch.object(TransactionInline, "get_confirmation_fields", return_value=[]), mock.patch.object(
+            ConsumerAdmin, "_change_confirmation_view"
+        ) as confirmation_view:
+            response = self.client.post(url, data=data)
+            confirmation_view.assert_not_called()
+        self.assertEqual(response.status_code, 302)
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.transaction.total, 999)
+
+    def test_precheck_should_build_the_forms_for_confirmation_fields_not_on_the_model(self):
+        self.setAdminAttributes(ConsumerAdmin, confirmation_precheck=True)
+        self.setAdminAttributes(TransactionInline, confirm_change=True)
+        self.transaction.save()
+        data = {
+            "name": self.consumer.name,
+            "email": self.consumer.email,
+            "transactions-TOTAL_FORMS": "1",
+            "transactions-INITIAL_FORMS": "1",
+            "transactions-MIN_NUM_FORMS": "0",
+            "transactions-MAX_NUM_FORMS": "1000",
+            "transactions-0-id": self.transaction.id,
+            "transactions-0-consumer": self.consumer.id,
+            "transactions-0-timestamp_0": self.transaction.timestamp.strftime("%Y-%m-%d"),
+            "transactions-0-timestamp_1": self.transaction.timestamp.strftime("%H:%M:%S"),
+            "transactions-0-total": str(self.transaction.total),
+            "transactions-0-currency": self.transaction.currency,
+            "transactions-0-shop": f"{self.shop.id}",
+            "transactions-0-date": self.transaction.date.strftime("%Y-%m-%d"),
+            "Transaction_confirm_change": True,
+            "_save": "Save",
+        }
+        url = reverse("admin:market_consumer_change", args=[self.consumer.id])
+
+        # A field of the form only cannot be compared to the stored row, so the forms are built
+        with mock.patch.object(
+            TransactionInline, "get_confirmation_fields", return_value=["form_only"]
+        ), mock.patch.object(
+            ConsumerAdmin,
+            "_change_confirmation_view",
+            autospec=True,
+            side_effect=ConsumerAdmin._change_confirmation_view,
+        ) as confirmation_view:
+            response = self.client.post(url, data=data)
+            confirmation_view.assert_called_once()
+        self.assertEqual(response.status_code, 302)
+
+    def _get_transactions_data(self, transactions, timestamp):
+        data = {
+            "name": self.consumer.name,
+            "email": self.consumer.email,
+            "transactions-TOTAL_FORMS": str(len(transactions)),
+            "transactions-INITIAL_FORMS": str(len(transactions)),
+            "transactions-MIN_NUM_FORMS": "0",
+            "transactions-MAX_NUM_FORMS": "1000",
+            "Transaction_confirm_change": True,
+            "_save": "Save",
+        }
+        for index, transaction in enumerate(transactions):
+            data.update(
+                {
+                    f"transactions-{index}-id": transaction.id,
+                    f"transactions-{index}-consumer": self.consumer.id,
+                    f"transactions-{index}-timestamp_0": timestamp.strftime("%Y-%m-%d"),
+                    f"transactions-{index}-timestamp_1": timestamp.strftime("%H:%M:%S"),
+                    f"transactions-{index}-total": str(transaction.total),
+                    f"transactions-{index}-currency": transaction.currency,
+                    f"transactions-{index}-shop": f"{self.shop.id}",
+                    f"transactions-{index}-date": transaction.date.strftime("%Y-%m-%d"),
+                }
+            )
+        return data
+
+    def test_only_changed_inline_rows_should_be_diffed(self):
+        self.setAdminAttributes(TransactionInline, confirm_change=True)
+        timestamp = self.transaction.timestamp.replace(microsecond=0)
+        transactions = TransactionFactory.create_batch(
+            50, consumer=self.consumer, shop=self.shop, timestamp=timestamp
+        )
+        data = self._get_transactions_data(transactions, timestamp)
+        data["transactions-7-total"] = "999.00"
+
+        with mock.patch.object(
+            admin_confirm_admin, "get_changed_data", wraps=admin_confirm_admin.get_changed_data
+        ) as get_changed_data:
+            response = self.client.post(
+                reverse("admin:market_consumer_change", args=[self.consumer.id]), data=data
+            )
+            # The consumer form and the single changed row
+            self.assertEqual(get_changed_data.call_count, 2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context_data["formsets_changed_data"]["transactions"]),
+            ["transactions-7"],
+        )
+
+    def test_only_changed_inline_rows_should_be_rendered_in_the_hidden_form(self):
+        self.setAdminAttributes(TransactionInline, confirm_change=True)
+        timestamp = self.transaction.timestamp.replace(microsecond=0)
+        transactions = TransactionFactory.create_batch(
+            10, consumer=self.consumer, shop=self.shop, timestamp=timestamp
+        )
+        data = self._get_transactions_data(transactions, timestamp)
+        data["transactions-7-total"] = "999.00"
+        url = reverse("admin:market_consumer_change", args=[self.consumer.id])
+
+        response = self.client.post(url, data=data)
+        self.assertEqual(response.status_code, 200)
+        content = response.rendered_content
+        # Unchanged rows are posted back as submitted, the changed row is rendered with its widgets
+        self.assertInHTML(
+            f'<input type="hidden" name="transactions-0-total" value="{transactions[0].total}">', content
+        )
+        self.assertIn('type="number" name="transactions-7-total" value="999.00"', content)
+        self.assertNotIn('type="number" name="transactions-0-total"', content)
+
+        confirmation = get_hidden_form_data(content)
+        for key in ("Transaction_confirm_change", "csrfmiddlewaretoken"):
+            confirmation.pop(key, None)
+        response = self.client.post(url, data={**confirmation, "_save": "Save", CONFIRMATION_RECEIVED: True})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(str(Transaction.objects.get(pk=transactions[7].pk).total), "999.00")
+        self.assertEqual(Transaction.objects.get(pk=transactions[0].pk).total, transactions[0].total)
@@ -4,7 +4,7 @@ from django.core.cache import cache
 from django.urls import reverse
 
 from admin_confirm.tests.helpers import AdminConfirmTestCase
-from admin_confirm.utils import format_cache_key
+from admin_confirm.utils import format_cache_key, get_confirmation_namespace
 from tests.market.admin import ItemAdmin, ShoppingMallAdmin
 from tests.market.models import GeneralManager, Item, ShoppingMall, Town
 from tests.factories import ItemFactory, ShopFactory
@@ -13,6 +13,7 @@ from admin_confirm.constants import (
     CACHE_KEYS,
     CONFIRMATION_OPTIONS,
     CONFIRMATION_RECEIVED,
+    CONFIRMATION_TOKEN,
 )
 
 
@@ -51,7 +52,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         )
 
         # Should have cached the unsaved item
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNotNone(cached_item)
         self.assertIsNone(cached_item.id)
         self.assertEqual(cached_item.name, data["name"])
@@ -64,6 +65,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         # Click "Yes, I'm Sure"
         del data["_confirm_add"]
         data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(reverse("admin:market_item_add"), data=data)
 
         # Should have redirected to changelist
@@ -111,7 +113,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         )
 
         # Should have cached the unsaved item
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNotNone(cached_item)
 
         # Should not have saved the changes yet
@@ -122,6 +124,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         # Click "Yes, I'm Sure"
         del data["_confirm_change"]
         data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
 
         # Should not have redirected to changelist
@@ -181,11 +184,16 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         self.assertEqual(Item.objects.count(), 0)
 
         # Should have cached the unsaved file and image
+        namespace = get_confirmation_namespace(
+            response.wsgi_request, self._getConfirmationToken(response)
+        )
         self.assertIn(
-            format_cache_key(model="Item", field="file"), ItemAdmin._file_cache.cached_keys
+            format_cache_key(model="Item", field="file", namespace=namespace),
+            ItemAdmin._file_cache.cached_keys,
         )
         self.assertIn(
-            format_cache_key(model="Item", field="image"), ItemAdmin._file_cache.cached_keys
+            format_cache_key(model="Item", field="image", namespace=namespace),
+            ItemAdmin._file_cache.cached_keys,
         )
 
         # Click "Yes, I'm Sure"
@@ -194,6 +202,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         del confirmation_data["image"]
         del confirmation_data["file"]
         confirmation_data[CONFIRMATION_RECEIVED] = True
+        confirmation_data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(reverse("admin:market_item_add"), data=confirmation_data)
 
         # Should have redirected to changelist
@@ -287,6 +296,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         del data["_confirm_change"]
         data["image"] = ""
         data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
 
         # Should not have redirected to changelist
@@ -346,7 +356,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_save")
 
         # Should not have cached the unsaved object
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Click "Yes, I'm Sure"
@@ -417,7 +427,7 @@ class TestConfirmSaveActions(AdminConfirmTestCase):
         self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_saveasnew")
 
         # Should not have cached the unsaved obj
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Should not have saved changes yet
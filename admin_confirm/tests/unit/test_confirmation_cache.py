@@ -1,14 +1,25 @@
+import os
+import tempfile
 from unittest import mock
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.contrib.admin import ModelAdmin
 from django.urls import reverse
 
+from admin_confirm.admin import AdminConfirmMixin
+from admin_confirm.file_cache import FileCache
 from admin_confirm.tests.helpers import AdminConfirmTestCase
-from tests.market.admin import ItemAdmin, ShoppingMallAdmin
+from tests.market.admin import ItemAdmin, ShopAdmin, ShoppingMallAdmin
 from tests.market.models import GeneralManager, Item, ShoppingMall, Town
 from tests.factories import ItemFactory, ShopFactory
 
-from admin_confirm.constants import CACHE_KEYS, CONFIRMATION_OPTIONS, CONFIRMATION_RECEIVED
+from admin_confirm.constants import (
+    CACHE_KEYS,
+    CONFIRMATION_OPTIONS,
+    CONFIRMATION_RECEIVED,
+    CONFIRMATION_TOKEN,
+    PENDING_CONFIRMATIONS_SESSION_KEY,
+)
 
 
 @mock.patch.object(ShoppingMallAdmin, "inlines", [])
@@ -46,7 +57,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         )
 
         # Should have cached the unsaved item
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNotNone(cached_item)
         self.assertIsNone(cached_item.id)
         self.assertEqual(cached_item.name, data["name"])
@@ -59,6 +70,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         # Click "Yes, I'm Sure"
         del data["_confirm_add"]
         data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(reverse("admin:market_item_add"), data=data)
 
         # Should have redirected to changelist
@@ -106,7 +118,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         )
 
         # Should have cached the unsaved item
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNotNone(cached_item)
 
         # Should not have saved the changes yet
@@ -117,6 +129,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         # Click "Yes, I'm Sure"
         del data["_confirm_change"]
         data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
 
         # Should not have redirected to changelist
@@ -173,7 +186,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         )
 
         # Should have cached the unsaved item
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNotNone(cached_item)
         self.assertIsNone(cached_item.id)
         self.assertEqual(cached_item.name, data["name"])
@@ -191,6 +204,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         del confirmation_data["image"]
         del confirmation_data["file"]
         confirmation_data[CONFIRMATION_RECEIVED] = True
+        confirmation_data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(reverse("admin:market_item_add"), data=confirmation_data)
 
         # Should have redirected to changelist
@@ -213,6 +227,85 @@ class TestConfirmationCache(AdminConfirmTestCase):
         for key in CACHE_KEYS.values():
             self.assertIsNone(cache.get(key))
 
+    @mock.patch.object(FileCache, "chunk_size", 1024)
+    def test_file_add_with_chunked_file_cache(self):
+        self.setAdminAttributes(ItemAdmin, confirm_add=True)
+        f = SimpleUploadedFile(
+            name="test_file.jpg",
+            content=self.image_content,
+            content_type="image/jpeg",
+        )
+        # Click "Save"
+        data = {
+            "name": "name",
+            "price": 2.0,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "file": f,
+            "_confirm_add": True,
+            "_save": True,
+        }
+        response = self.client.post(reverse("admin:market_item_add"), data=data)
+
+        # Should be shown confirmation page
+        self._assertSubmitHtml(
+            rendered_content=response.rendered_content,
+            save_action="_save",
+            multipart_form=True,
+        )
+
+        # Click "Yes, I'm Sure"
+        confirmation_data = data.copy()
+        del confirmation_data["_confirm_add"]
+        del confirmation_data["file"]
+        confirmation_data[CONFIRMATION_RECEIVED] = True
+        confirmation_data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
+        response = self.client.post(reverse("admin:market_item_add"), data=confirmation_data)
+        self.assertEqual(response.status_code, 302)
+
+        # Should have saved the file rebuilt from the cached chunks
+        saved_item = Item.objects.get()
+        self.assertRegex(saved_item.file.name, r"test_file.*\.jpg$")
+        with saved_item.file.open("rb") as saved_file:
+            self.assertEqual(saved_file.read(), self.image_content)
+
+    def test_file_add_with_spooled_file_cache(self):
+        self.setAdminAttributes(ItemAdmin, confirm_add=True)
+        spool_dir = tempfile.mkdtemp()
+        self.setAdminAttributes(FileCache, spool_threshold=0, spool_dir=spool_dir)
+        f = SimpleUploadedFile(
+            name="test_file.jpg",
+            content=self.image_content,
+            content_type="image/jpeg",
+        )
+        # Click "Save"
+        data = {
+            "name": "name",
+            "price": 2.0,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "file": f,
+            "_confirm_add": True,
+            "_save": True,
+        }
+        response = self.client.post(reverse("admin:market_item_add"), data=data)
+
+        # Should have spooled the file instead of caching its content
+        self.assertEqual(len(os.listdir(spool_dir)), 1)
+
+        # Click "Yes, I'm Sure"
+        confirmation_data = data.copy()
+        del confirmation_data["_confirm_add"]
+        del confirmation_data["file"]
+        confirmation_data[CONFIRMATION_RECEIVED] = True
+        confirmation_data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
+        response = self.client.post(reverse("admin:market_item_add"), data=confirmation_data)
+        self.assertEqual(response.status_code, 302)
+
+        # Should have saved the spooled file and cleaned up the spool
+        saved_item = Item.objects.get()
+        with saved_item.file.open("rb") as saved_file:
+            self.assertEqual(saved_file.read(), self.image_content)
+        self.assertEqual(os.listdir(spool_dir), [])
+
     def test_file_and_image_change(self):
         item = ItemFactory(name="Not name")
         # Select files
@@ -268,7 +361,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         )
 
         # Should have cached the unsaved item
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNotNone(cached_item)
 
         # Should not have saved the changes yet
@@ -282,6 +375,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         del data["_confirm_change"]
         data["image"] = ""
         data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
 
         # Should not have redirected to changelist
@@ -335,7 +429,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_save")
 
         # Should not have cached the unsaved object
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Should not have saved the object yet
@@ -407,7 +501,7 @@ class TestConfirmationCache(AdminConfirmTestCase):
         self._assertSubmitHtml(rendered_content=response.rendered_content, save_action="_continue")
 
         # Should not have cached the unsaved obj
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Should not have saved changes yet
@@ -445,3 +539,271 @@ class TestConfirmationCache(AdminConfirmTestCase):
         # Should have cleared cache
         for key in CACHE_KEYS.values():
             self.assertIsNone(cache.get(key))
+
+    def test_concurrent_confirmations_should_not_overwrite_each_other(self):
+        item = ItemFactory(name="Not name")
+        other_item = ItemFactory(name="Other name")
+        self.setAdminAttributes(ItemAdmin, confirm_change=True)
+
+        responses = []
+        for obj, name in ((item, "first"), (other_item, "second")):
+            data = {
+                "id": obj.id,
+                "name": name,
+                "price": 2.0,
+                "currency": Item.VALID_CURRENCIES[0][0],
+                "_confirm_change": True,
+                "_continue": True,
+            }
+            responses.append(
+                (obj, data, self.client.post(f"/admin/market/item/{obj.id}/change/", data=data))
+            )
+
+        # Each confirmation should have its own token and cached object
+        first, second = responses
+        self.assertNotEqual(
+            self._getConfirmationToken(first[2]), self._getConfirmationToken(second[2])
+        )
+        self.assertEqual(self._getCachedObject(first[2]).name, "first")
+        self.assertEqual(self._getCachedObject(second[2]).name, "second")
+
+        # Confirming one should leave the other's cached object alone
+        obj, data, response = first
+        del data["_confirm_change"]
+        data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
+        self.client.post(f"/admin/market/item/{obj.id}/change/", data=data)
+
+        self.assertIsNone(self._getCachedObject(first[2]))
+        self.assertEqual(self._getCachedObject(second[2]).name, "second")
+        item.refresh_from_db()
+        self.assertEqual(item.name, "first")
+
+    def test_files_should_be_cached_and_reconstructed_in_one_round_trip(self):
+        self.setAdminAttributes(ItemAdmin, confirm_add=True)
+        data = {
+            "name": "name",
+            "price": 2.0,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "file": SimpleUploadedFile(name="test_file.jpg", content=self.image_content),
+            "image": SimpleUploadedFile(name="test_image.jpg", content=self.image_content),
+            "_confirm_add": True,
+            "_save": True,
+        }
+        with mock.patch.object(
+            FileCache, "set_many", autospec=True, side_effect=FileCache.set_many
+        ) as set_many:
+            response = self.client.post(reverse("admin:market_item_add"), data=data)
+            set_many.assert_called_once()
+            self.assertEqual(len(set_many.call_args.args[1]), 2)
+
+        # Click "Yes, I'm Sure"
+        del data["_confirm_add"]
+        del data["file"]
+        del data["image"]
+        data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
+        with mock.patch.object(
+            FileCache, "get_many", autospec=True, side_effect=FileCache.get_many
+        ) as get_many, mock.patch.object(FileCache, "get") as get:
+            self.client.post(reverse("admin:market_item_add"), data=data)
+            get_many.assert_called_once()
+            get.assert_not_called()
+
+        saved_item = Item.objects.get()
+        self.assertRegex(saved_item.file.name, r"test_file.*\.jpg$")
+        self.assertRegex(saved_item.image.name, r"test_image.*\.jpg$")
+
+    def test_file_change_should_load_the_object_once_on_confirmation(self):
+        item = ItemFactory(name="Not name")
+        self.setAdminAttributes(ItemAdmin, confirm_change=True)
+        data = {
+            "id": item.id,
+            "name": "name",
+            "price": 2.0,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "file": SimpleUploadedFile(name="test_file.jpg", content=self.image_content),
+            "_confirm_change": True,
+            "_continue": True,
+        }
+        response = self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
+
+        # Click "Yes, I'm Sure"
+        del data["_confirm_change"]
+        del data["file"]
+        data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
+        with mock.patch.object(
+            ModelAdmin, "get_object", autospec=True, side_effect=ModelAdmin.get_object
+        ) as get_object:
+            self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
+            get_object.assert_called_once()
+
+        item.refresh_from_db()
+        self.assertEqual(item.name, "name")
+        self.assertRegex(item.file.name, r"test_file.*\.jpg$")
+
+    def _stage_item_change(self, item, name):
+        data = {
+            "id": item.id,
+            "name": name,
+            "price": 2.0,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "_confirm_change": True,
+            "_continue": True,
+        }
+        return self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
+
+    def test_save_without_pending_confirmation_should_not_purge_cache(self):
+        item = ItemFactory(name="Not name")
+        data = {
+            "id": item.id,
+            "name": "name",
+            "price": item.price,
+            "currency": item.currency,
+            "_continue": True,
+        }
+        with mock.patch("admin_confirm.admin.cache") as admin_cache, mock.patch.object(
+            FileCache, "delete_many"
+        ) as file_cache_delete_many:
+            response = self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
+            admin_cache.delete_many.assert_not_called()
+            file_cache_delete_many.assert_not_called()
+
+        self.assertEqual(response.status_code, 302)
+        item.refresh_from_db()
+        self.assertEqual(item.name, "name")
+
+    def test_save_should_purge_abandoned_confirmation_of_the_same_object(self):
+        item = ItemFactory(name="Not name")
+        other_item = ItemFactory(name="Other name")
+        self.setAdminAttributes(ItemAdmin, confirm_change=True)
+        abandoned = self._stage_item_change(item, "abandoned")
+        other = self._stage_item_change(other_item, "other")
+        self.assertEqual(len(self.client.session[PENDING_CONFIRMATIONS_SESSION_KEY]), 2)
+
+        # Save the item without any change needing confirmation
+        data = {
+            "id": item.id,
+            "name": "Not name",
+            "price": item.price,
+            "currency": item.currency,
+            "_continue": True,
+        }
+        self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
+
+        # Should only have purged the abandoned confirmation of that item
+        self.assertIsNone(self._getCachedObject(abandoned))
+        self.assertEqual(self._getCachedObject(other).name, "other")
+        self.assertEqual(len(self.client.session[PENDING_CONFIRMATIONS_SESSION_KEY]), 1)
+
+    def test_confirmation_received_should_remove_pending_confirmation(self):
+        item = ItemFactory(name="Not name")
+        self.setAdminAttributes(ItemAdmin, confirm_change=True)
+        response = self._stage_item_change(item, "name")
+
+        data = {
+            "id": item.id,
+            "name": "name",
+            "price": 2.0,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "_continue": True,
+            CONFIRMATION_RECEIVED: True,
+            CONFIRMATION_TOKEN: self._getConfirmationToken(response),
+        }
+        self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
+
+        self.assertEqual(self.client.session[PENDING_CONFIRMATIONS_SESSION_KEY], [])
+
+    @mock.patch("admin_confirm.admin.PURGE_WITHOUT_FILE_FIELDS", False)
+    def test_purge_can_be_turned_off_for_models_without_file_fields(self):
+        shop = ShopFactory(name="shop")
+        item = ItemFactory(name="Not name")
+        with mock.patch.object(
+            AdminConfirmMixin, "_clear_pending_confirmations"
+        ) as clear_pending_confirmations:
+            self.client.post(
+                f"/admin/market/shop/{shop.id}/change/",
+                data={"id": shop.id, "name": "name", "_continue": True},
+            )
+            clear_pending_confirmations.assert_not_called()
+
+            # Models with file fields still purge
+            self.client.post(
+                f"/admin/market/item/{item.id}/change/",
+                data={
+                    "id": item.id,
+                    "name": "name",
+                    "price": item.price,
+                    "currency": item.currency,
+                    "_continue": True,
+                },
+            )
+            clear_pending_confirmations.assert_called_once()
+
+    def test_cached_post_should_be_replayed_on_confirmation(self):
+        shop = ShopFactory(name="shop")
+        self.setAdminAttributes(ShopAdmin, confirm_change=True, cache_confirmation_post=True)
+        data = {"id": shop.id, "name": "name", "_confirm_change": True, "_continue": True}
+        response = self.client.post(f"/admin/market/shop/{shop.id}/change/", data=data)
+
+        # Should not render the submitted form on the confirmation page
+        self.assertTrue(response.context_data["post_cached"])
+        self.assertNotIn('id="hidden-form"', response.rendered_content)
+        self.assertIn(CONFIRMATION_RECEIVED, response.rendered_content)
+        token = self._getConfirmationToken(response)
+        self.assertIsNotNone(token)
+
+        # Click "Yes, I'm Sure" - only the token is posted back
+        data = {"_continue": True, CONFIRMATION_RECEIVED: True, CONFIRMATION_TOKEN: token}
+        response = self.client.post(f"/admin/market/shop/{shop.id}/change/", data=data)
+
+        self.assertEqual(response.status_code, 302)
+        shop.refresh_from_db()
+        self.assertEqual(shop.name, "name")
+        self.assertEqual(self.client.session[PENDING_CONFIRMATIONS_SESSION_KEY], [])
+
+    def test_cached_post_should_be_replayed_with_cached_files(self):
+        self.setAdminAttributes(ItemAdmin, confirm_add=True, cache_confirmation_post=True)
+        data = {
+            "name": "name",
+            "price": 2.0,
+            "currency": Item.VALID_CURRENCIES[0][0],
+            "file": SimpleUploadedFile(name="test_file.jpg", content=self.image_content),
+            "_confirm_add": True,
+            "_save": True,
+        }
+        response = self.client.post(reverse("admin:market_item_add"), data=data)
+
+        data = {
+            "_save": True,
+            CONFIRMATION_RECEIVED: True,
+            CONFIRMATION_TOKEN: self._getConfirmationToken(response),
+        }
+        self.client.post(reverse("admin:market_item_add"), data=data)
+
+        saved_item = Item.objects.get()
+        self.assertEqual(saved_item.name, "name")
+        self.assertEqual(saved_item.price, 2.0)
+        self.assertRegex(saved_item.file.name, r"test_file.*\.jpg$")
+
+    def test_expired_cached_post_should_redirect_back_to_the_form(self):
+        shop = ShopFactory(name="shop")
+        self.setAdminAttributes(ShopAdmin, confirm_change=True, cache_confirmation_post=True)
+        data = {"id": shop.id, "name": "name", "_confirm_change": True, "_continue": True}
+        response = self.client.post(f"/admin/market/shop/{shop.id}/change/", data=data)
+
+        cache.clear()
+        data = {
+            "_continue": True,
+            CONFIRMATION_RECEIVED: True,
+            CONFIRMATION_TOKEN: self._getConfirmationToken(response),
+        }
+        response = self.client.post(
+            f"/admin/market/shop/{shop.id}/change/", data=data, follow=True
+        )
+
+        self.assertRedirects(response, f"/admin/market/shop/{shop.id}/change/")
+        self.assertIn("The confirmation has expired", response.rendered_content)
+        shop.refresh_from_db()
+        self.assertEqual(shop.name, "shop")
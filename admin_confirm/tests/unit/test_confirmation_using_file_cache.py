@@ -20,7 +20,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 
 from admin_confirm.tests.helpers import AdminConfirmTestCase
-from admin_confirm.constants import CACHE_KEYS, CONFIRMATION_RECEIVED
+from admin_confirm.constants import CACHE_KEYS, CONFIRMATION_RECEIVED, CONFIRMATION_TOKEN
 
 from tests.market.admin import ItemAdmin
 from tests.market.admin.shop_admin import ShopAdmin
@@ -796,7 +796,7 @@ class TestConfirmationUsingFileCache(AdminConfirmTestCase):
         )
 
         # Should have cached the unsaved item
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNotNone(cached_item)
 
         # Should not have saved the changes yet
@@ -811,13 +811,14 @@ class TestConfirmationUsingFileCache(AdminConfirmTestCase):
         time.sleep(1)
 
         # Check that it did time out
-        cached_item = cache.get(CACHE_KEYS["object"])
+        cached_item = self._getCachedObject(response)
         self.assertIsNone(cached_item)
 
         # Click "Yes, I'm Sure"
         del data["_confirm_change"]
         data["image"] = ""
         data[CONFIRMATION_RECEIVED] = True
+        data[CONFIRMATION_TOKEN] = self._getConfirmationToken(response)
         response = self.client.post(f"/admin/market/item/{item.id}/change/", data=data)
 
         # Should not have redirected to changelist
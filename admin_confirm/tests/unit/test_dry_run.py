@@ -0,0 +1,77 @@
+from django.urls import reverse
+
+from admin_confirm.action_progress import run_in_chunks
+from admin_confirm.dry_run import dry_run
+from admin_confirm.tests.helpers import AdminConfirmTestCase
+from tests.factories import ShopFactory
+from tests.market.models import Shop
+
+
+class TestDryRun(AdminConfirmTestCase):
+    def _post_capitalize_names(self, shops, **data):
+        return self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "action": ["capitalize_names"],
+                "select_across": ["0"],
+                "index": ["0"],
+                "_selected_action": [shop.pk for shop in shops],
+                **data,
+            },
+            follow=True,
+        )
+
+    def test_confirmation_page_should_show_cost_of_rolled_back_run(self):
+        shops = [ShopFactory(name=f"shop {i}") for i in range(3)]
+        response = self._post_capitalize_names(shops)
+
+        result = response.context_data["dry_run"]
+        self.assertIsNone(result["error"])
+        self.assertEqual(result["selected_count"], 3)
+        # One query for the shops, one update per shop
+        self.assertEqual(result["query_count"], 4)
+        self.assertEqual(result["rows_affected"], 3)
+        self.assertGreaterEqual(result["duration"], 0)
+        self.assertTrue(result["queries_per_object"])
+
+        content = response.rendered_content
+        self.assertIn("A dry run of this action issued 4 queries affecting 3 rows", content)
+        self.assertIn("it likely queries each object separately", content)
+        # The changes and the messages of the dry run are discarded
+        self.assertNotIn("Capitalized", content)
+        self.assertCountEqual(Shop.objects.values_list("name", flat=True), ["shop 0", "shop 1", "shop 2"])
+
+    def test_confirmed_action_should_not_dry_run(self):
+        shops = [ShopFactory(name=f"shop {i}") for i in range(2)]
+        response = self._post_capitalize_names(shops, _confirm_action=["Yes, I'm sure"])
+
+        self.assertNotIn("dry_run", response.context)
+        self.assertIn("Capitalized 2 shops", [str(m) for m in response.context["messages"]])
+        self.assertCountEqual(Shop.objects.values_list("name", flat=True), ["SHOP 0", "SHOP 1"])
+
+    def test_dry_run_should_report_error_of_action(self):
+        ShopFactory(name="shop")
+
+        def failing_action(modeladmin, request, queryset):
+            queryset.update(name="renamed")
+            raise ValueError("Out of stock")
+
+        result = dry_run(failing_action, None, None, Shop.objects.all())
+        self.assertEqual(result["error"], "Out of stock")
+        self.assertEqual(result["rows_affected"], 1)
+        self.assertFalse(result["queries_per_object"])
+        self.assertEqual(Shop.objects.get().name, "shop")
+
+    def test_dry_run_should_not_count_savepoints_of_action(self):
+        ShopFactory(name="shop")
+
+        def chunked_run(func, modeladmin, request, queryset):
+            return run_in_chunks(func, modeladmin, request, queryset, 1)
+
+        def rename(modeladmin, request, queryset):
+            queryset.update(name="renamed")
+
+        result = dry_run(rename, None, None, Shop.objects.all(), chunked_run)
+        # count, first chunk, next chunk, update
+        self.assertEqual(result["query_count"], 4)
+        self.assertEqual(Shop.objects.get().name, "shop")
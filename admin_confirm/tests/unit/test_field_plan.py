@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.contrib.admin import AdminSite
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from admin_confirm import field_plan
+from admin_confirm.field_plan import (
+    get_confirmation_field_plan,
+    get_declared_admin_fields,
+    get_model_field_plan,
+)
+from tests.market.admin.consumer_admin import ConsumerAdmin
+from tests.market.admin.item_admin import ItemAdmin
+from tests.market.models import Consumer, Item, ShoppingMall
+
+
+class TestFieldPlan(TestCase):
+    def test_model_plan_should_find_file_fields(self):
+        item_plan = get_model_field_plan(Item)
+        self.assertCountEqual(item_plan.file_fields, ["image", "file"])
+        self.assertIn("name", item_plan.field_names)
+
+        mall_plan = get_model_field_plan(ShoppingMall)
+        self.assertEqual(mall_plan.file_fields, ())
+        self.assertIn("shops", mall_plan.field_names)
+
+    def test_confirmation_plan_should_only_include_admin_fields(self):
+        plan = get_confirmation_field_plan(Item, None, ("name", "image", "not_a_field"))
+        self.assertEqual(plan.confirmation_fields, {"name", "image"})
+
+    def test_confirmation_plan_should_only_include_configured_fields(self):
+        plan = get_confirmation_field_plan(
+            ShoppingMall, ("shops", "invalid"), ("name", "shops")
+        )
+        self.assertEqual(plan.confirmation_fields, {"shops"})
+
+    def test_confirmation_plan_should_be_built_once_per_fieldsets(self):
+        admin = ItemAdmin(Item, AdminSite())
+        request = RequestFactory().get("/")
+        get_confirmation_field_plan.cache_clear()
+        with mock.patch.object(
+            field_plan, "get_model_field_plan", wraps=get_model_field_plan
+        ) as get_plan:
+            fields = admin.get_confirmation_fields(request)
+            self.assertCountEqual(admin.get_confirmation_fields(request), fields)
+            get_plan.assert_called_once()
+
+            # A change of fieldsets builds a new plan
+            with mock.patch.object(
+                ItemAdmin, "get_fieldsets", return_value=[(None, {"fields": ["price"]})]
+            ):
+                self.assertEqual(admin.get_confirmation_fields(request), ["price"])
+            self.assertEqual(get_plan.call_count, 2)
+
+    def test_declared_fieldsets_should_be_used_without_building_the_form(self):
+        admin = ConsumerAdmin(Consumer, AdminSite())
+        request = RequestFactory().get("/")
+        self.assertEqual(get_declared_admin_fields(admin), ("name", "email"))
+        with mock.patch.object(ConsumerAdmin, "get_form") as get_form:
+            self.assertEqual(admin.get_confirmation_fields(request), ["name"])
+            get_form.assert_not_called()
+
+    def test_fieldsets_set_on_the_admin_should_be_used(self):
+        admin = ConsumerAdmin(Consumer, AdminSite())
+        admin.fieldsets = [(None, {"fields": ["email"]})]
+        request = RequestFactory().get("/")
+        self.assertEqual(get_declared_admin_fields(admin), ("email",))
+        self.assertEqual(admin.get_confirmation_fields(request), [])
+
+        admin = ItemAdmin(Item, AdminSite())
+        admin.fields = ["name", "price"]
+        self.assertEqual(admin.get_confirmation_fields(request), ["price"])
+
+    def test_declared_fields_should_not_be_used_when_get_fieldsets_is_overridden(self):
+        self.assertIsNone(get_declared_admin_fields(ItemAdmin(Item, AdminSite())))
+        with mock.patch.object(
+            ConsumerAdmin, "get_fieldsets", return_value=[(None, {"fields": ["email"]})]
+        ):
+            self.assertIsNone(
+                get_declared_admin_fields(ConsumerAdmin(Consumer, AdminSite()))
+            )
+        with mock.patch.object(ItemAdmin, "fields", ["name", "price"]):
+            self.assertEqual(
+                get_declared_admin_fields(ItemAdmin(Item, AdminSite())),
+                ("name", "price"),
+            )
@@ -1,5 +1,10 @@
+import os
+from unittest import mock
+
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from admin_confirm.file_cache import FileCache
+from admin_confirm.utils import format_chunk_key
 
 with open("screenshot.png", "rb") as f:
     file = SimpleUploadedFile(
@@ -32,3 +37,120 @@ def test_should_delete_all_file_cache():
     assert len(file_cache.cached_keys) == 0
     assert file_cache.get("key") is None
     assert file_cache.get("key2") is None
+
+
+def test_should_only_keep_the_most_recent_keys():
+    file_cache = FileCache()
+    file_cache.cached_keys_limit = 2
+    file_cache.set_many({"key": file, "key2": file, "key3": file})
+    assert file_cache.cached_keys == ["key2", "key3"]
+    file_cache.delete_all()
+
+
+def test_should_set_chunked_file_cache():
+    file_cache = FileCache()
+    file_cache.chunk_size = 1024
+    file_cache.set("key", file)
+    chunk_count = -(-file.size // 1024)
+    assert cache.get("key")["chunks"] == chunk_count
+    assert "content" not in cache.get("key")
+    for index in range(chunk_count):
+        assert len(cache.get(format_chunk_key("key", index))) <= 1024
+        assert format_chunk_key("key", index) in file_cache.cached_keys
+
+    cached_file = file_cache.get("key")
+    assert cached_file.name == file.name
+    assert cached_file.size == file.size
+    assert cached_file.read() == file.read()
+    file.seek(0)
+
+
+def test_should_read_chunked_file_cache_lazily():
+    file_cache = FileCache()
+    file_cache.chunk_size = 1024
+    file_cache.set("key", file)
+
+    with mock.patch.object(file_cache.cache, "get", wraps=file_cache.cache.get) as cache_get:
+        cached_file = file_cache.get("key")
+        # Only the manifest is loaded
+        assert [call.args[0] for call in cache_get.call_args_list] == ["key"]
+
+        cached_file.seek(2048 + 10)
+        assert cached_file.read(10) == file.read()[2058:2068]
+        file.seek(0)
+        # Only the chunk containing the position is loaded
+        assert [call.args[0] for call in cache_get.call_args_list] == [
+            "key",
+            format_chunk_key("key", 2),
+        ]
+
+
+def test_should_delete_chunked_file_cache():
+    file_cache = FileCache()
+    file_cache.chunk_size = 1024
+    file_cache.set("key", file)
+    file_cache.delete("key")
+    assert len(file_cache.cached_keys) == 0
+    assert file_cache.get("key") is None
+    assert cache.get(format_chunk_key("key", 0)) is None
+
+
+def test_should_spool_large_files_to_disk(tmp_path):
+    file_cache = FileCache()
+    file_cache.spool_threshold = file.size - 1
+    file_cache.spool_dir = str(tmp_path)
+    file_cache.set("key", file)
+    state = cache.get("key")
+    assert "content" not in state
+    assert os.path.dirname(state["path"]) == str(tmp_path)
+
+    cached_file = file_cache.get("key")
+    assert cached_file.temporary_file_path() == state["path"]
+    assert cached_file.name == file.name
+    assert cached_file.read() == file.read()
+    file.seek(0)
+    cached_file.close()
+
+    file_cache.delete("key")
+    assert not os.path.exists(state["path"])
+    assert file_cache.get("key") is None
+
+
+def test_should_not_spool_small_files(tmp_path):
+    file_cache = FileCache()
+    file_cache.spool_threshold = file.size
+    file_cache.spool_dir = str(tmp_path)
+    file_cache.set("key", file)
+    assert "path" not in cache.get("key")
+    assert os.listdir(tmp_path) == []
+    file_cache.delete_all()
+
+
+def test_should_delete_all_spooled_files(tmp_path):
+    file_cache = FileCache()
+    file_cache.spool_threshold = 0
+    file_cache.spool_dir = str(tmp_path)
+    file_cache.set("key", file)
+    file_cache.set("key2", file)
+    assert len(os.listdir(tmp_path)) == 2
+    file_cache.delete_all()
+    assert os.listdir(tmp_path) == []
+
+
+def test_should_set_and_get_many_files_in_one_round_trip():
+    file_cache = FileCache()
+    with mock.patch.object(file_cache.cache, "set_many", wraps=file_cache.cache.set_many) as set_many:
+        file_cache.set_many({"key": file, "key2": file})
+        set_many.assert_called_once()
+    assert file_cache.cached_keys == ["key", "key2"]
+
+    with mock.patch.object(file_cache.cache, "get_many", wraps=file_cache.cache.get_many) as get_many:
+        cached_files = file_cache.get_many(["key", "key2", "missing"])
+        get_many.assert_called_once()
+    assert set(cached_files) == {"key", "key2"}
+    assert cached_files["key2"].read() == file.read()
+    file.seek(0)
+
+    file_cache.delete_many(["key", "key2"])
+    assert file_cache.cached_keys == []
+    assert file_cache.get_many(["key", "key2"]) == {}
@@ -0,0 +1,109 @@
+from django.urls import reverse
+
+from admin_confirm.constants import CONFIRMATION_RECEIVED
+from admin_confirm.testing import RENDER, SUBMIT, get_query_budget
+from admin_confirm.tests.helpers import AdminConfirmTestCase
+from tests.factories import ItemFactory, ShopFactory
+from tests.market.admin import ItemAdmin, ShopAdmin, ShoppingMallAdmin
+from tests.market.models import Item, ShoppingMall
+
+
+class TestQueryBudget(AdminConfirmTestCase):
+    def test_get_query_budget_should_add_queries_per_inline_form(self):
+        self.setAdminAttributes(ItemAdmin, confirmation_query_budget={RENDER: (4, 2), SUBMIT: 3})
+        self.assertEqual(get_query_budget(ItemAdmin, RENDER, inline_forms=3), 10)
+        self.assertEqual(get_query_budget(ItemAdmin, SUBMIT, inline_forms=3), 3)
+        self.setAdminAttributes(ItemAdmin, confirmation_query_budget=None)
+        self.assertIsNone(get_query_budget(ItemAdmin, RENDER))
+
+    def test_budget_assertion_should_fail_over_budget_or_without_budget(self):
+        self.setAdminAttributes(ItemAdmin, confirmation_query_budget={RENDER: 1})
+        with self.assertRaisesRegex(AssertionError, "ItemAdmin render issued 2 queries, over its budget of 1"):
+            with self.assertConfirmationQueryBudget(ItemAdmin, RENDER):
+                list(Item.objects.all())
+                list(Item.objects.all())
+
+        with self.assertRaisesRegex(AssertionError, "has no budget for submit"):
+            with self.assertConfirmationQueryBudget(ItemAdmin, SUBMIT):
+                pass
+
+    def test_item_admin_should_stay_within_budget(self):
+        item = ItemFactory()
+        url = reverse("admin:market_item_change", args=[item.pk])
+        data = {"name": item.name, "price": item.price + 1, "currency": item.currency, "_save": True}
+
+        with self.assertConfirmationQueryBudget(ItemAdmin, RENDER):
+            response = self.client.post(url, {**data, "_confirm_change": True})
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertConfirmationQueryBudget(ItemAdmin, SUBMIT):
+            response = self.client.post(url, {**data, CONFIRMATION_RECEIVED: True})
+        self.assertEqual(response.status_code, 302)
+
+    def _get_shopping_mall_data(self, mall, shops):
+        prefix = "ShoppingMall_shops"
+        data = {
+            "name": "changed",
+            "shops": [shop.pk for shop in shops],
+            "_save": True,
+            f"{prefix}-TOTAL_FORMS": len(shops),
+            f"{prefix}-INITIAL_FORMS": len(shops),
+            f"{prefix}-MIN_NUM_FORMS": 0,
+            f"{prefix}-MAX_NUM_FORMS": 1000,
+        }
+        for index, mall_shop in enumerate(ShoppingMall.shops.through.objects.filter(shoppingmall=mall)):
+            data.update(
+                {
+                    f"{prefix}-{index}-id": mall_shop.pk,
+                    f"{prefix}-{index}-shoppingmall": mall.pk,
+                    f"{prefix}-{index}-shop": mall_shop.shop_id,
+                }
+            )
+        return data
+
+    def test_shopping_mall_admin_with_inlines_should_stay_within_budget(self):
+        shops = [ShopFactory() for i in range(10)]
+        choices_queries = {}
+        # The budget is checked with growing numbers of inline forms, so N+1 queries show up
+        for inline_forms in (1, 5, 10):
+            mall = ShoppingMall.objects.create(name=f"mall {inline_forms}")
+            mall.shops.set(shops[:inline_forms])
+            data = self._get_shopping_mall_data(mall, shops[:inline_forms])
+            url = reverse("admin:market_shoppingmall_change", args=[mall.pk])
+
+            with self.assertConfirmationQueryBudget(ShoppingMallAdmin, RENDER, inline_forms) as render:
+                response = self.client.post(url, {**data, "_confirm_change": True})
+            self.assertEqual(response.status_code, 200)
+            for index, shop in enumerate(shops[:inline_forms]):
+                self.assertInHTML(
+                    f'<option value="{shop.pk}" selected>{shop}</option>',
+                    str(response.context_data["formsets"][0].forms[index]["shop"]),
+                )
+            choices_queries[inline_forms] = [
+                query["sql"]
+                for query in render.captured_queries
+                if query["sql"].startswith('SELECT "market_shop"."id", "market_shop"."name" FROM "market_shop"')
+                and "WHERE" not in query["sql"]
+            ]
+
+            with self.assertConfirmationQueryBudget(ShoppingMallAdmin, SUBMIT, inline_forms):
+                response = self.client.post(url, {**data, CONFIRMATION_RECEIVED: True})
+            self.assertEqual(response.status_code, 302)
+            mall.refresh_from_db()
+            self.assertEqual(mall.name, "changed")
+
+        # The hidden formset loads the shop choices once, not once per inline form
+        self.assertEqual(len(choices_queries[10]), len(choices_queries[1]))
+
+    def test_shop_admin_action_should_stay_within_budget(self):
+        shops = [ShopFactory() for i in range(10)]
+        url = reverse("admin:market_shop_changelist")
+        data = {"action": "show_message", "_selected_action": [shop.pk for shop in shops]}
+
+        with self.assertConfirmationQueryBudget(ShopAdmin, RENDER):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertConfirmationQueryBudget(ShopAdmin, SUBMIT):
+            response = self.client.post(url, {**data, "_confirm_action": "Yes, I'm sure"})
+        self.assertEqual(response.status_code, 302)
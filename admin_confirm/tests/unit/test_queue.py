@@ -0,0 +1,160 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from admin_confirm.action_progress import DONE, FAILED, QUEUED, RUNNING
+from admin_confirm.models import QueuedAction
+from admin_confirm.constants import QUEUE_STALE_TIMEOUT
+from admin_confirm.queue import STALE_ERROR, BaseQueueBackend, DatabaseQueueBackend, get_queue_backend
+from admin_confirm.selection import encode_pks
+from admin_confirm.tests.helpers import AdminConfirmTestCase
+from admin_confirm.worker import run_next
+from tests.factories import ShopFactory
+from tests.market.models import Shop
+
+
+class TestQueuedActions(AdminConfirmTestCase):
+    def _confirm_capitalize_names_queued(self, shops):
+        return self.client.post(
+            reverse("admin:market_shop_changelist"),
+            data={
+                "_confirm_action": ["Yes, I'm sure"],
+                "action": ["capitalize_names_queued"],
+                "_selected_action": [shop.pk for shop in shops],
+            },
+        )
+
+    def test_confirming_should_queue_action_and_redirect_to_status(self):
+        shops = [ShopFactory(name=f"shop {i}") for i in range(3)]
+        response = self._confirm_capitalize_names_queued(shops[:2])
+
+        job = QueuedAction.objects.get()
+        self.assertEqual(job.status, QUEUED)
+        self.assertEqual(job.model, "market.shop")
+        self.assertEqual(job.admin_site, "admin")
+        self.assertEqual(job.user, self.superuser)
+        self.assertEqual(job.selection, encode_pks([shops[0].pk, shops[1].pk]))
+        status_url = reverse("admin:market_shop_queued_action", args=[job.pk])
+        self.assertRedirects(response, status_url)
+        # Nothing ran within the request
+        self.assertCountEqual(Shop.objects.values_list("name", flat=True), ["shop 0", "shop 1", "shop 2"])
+
+        response = self.client.get(status_url)
+        self.assertEqual(response.context_data["job"]["status"], QUEUED)
+        self.assertIn('http-equiv="refresh"', response.rendered_content)
+
+    def test_worker_should_run_queued_action_once(self):
+        shops = [ShopFactory(name=f"shop {i}") for i in range(4)]
+        self._confirm_capitalize_names_queued(shops[:3])
+
+        self.assertTrue(run_next())
+        self.assertFalse(run_next())
+
+        self.assertCountEqual(
+            Shop.objects.values_list("name", flat=True), ["SHOP 0", "SHOP 1", "SHOP 2", "shop 3"]
+        )
+        job = QueuedAction.objects.get()
+        self.assertEqual(job.status, DONE)
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.finished_at)
+        # The action ran in chunks of 2
+        self.assertEqual(job.messages, ["Capitalized 2 shops", "Capitalized 1 shops"])
+
+        response = self.client.get(reverse("admin:market_shop_queued_action", args=[job.pk]))
+        content = response.rendered_content
+        self.assertIn("Capitalized 2 shops", content)
+        self.assertNotIn('http-equiv="refresh"', content)
+
+    def test_worker_should_fail_action_no_longer_allowed(self):
+        shop = ShopFactory(name="shop")
+        backend = get_queue_backend()
+        job_id = backend.enqueue(
+            admin_site="admin",
+            model="market.shop",
+            action="show_message_no_confirmation",
+            selection=encode_pks([shop.pk]),
+            user_id=self.superuser.pk,
+        )
+        self.assertTrue(run_next(backend))
+
+        job = backend.get(job_id)
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["error"], "Action show_message_no_confirmation is not allowed")
+
+    def test_worker_should_fail_action_of_inactive_user(self):
+        shop = ShopFactory(name="shop")
+        self._confirm_capitalize_names_queued([shop])
+        User.objects.filter(pk=self.superuser.pk).update(is_active=False)
+
+        run_next()
+        job = QueuedAction.objects.get()
+        self.assertEqual(job.status, FAILED)
+        self.assertEqual(Shop.objects.get().name, "shop")
+
+    def test_status_page_should_only_be_reachable_by_user_who_queued(self):
+        shop = ShopFactory(name="shop")
+        self._confirm_capitalize_names_queued([shop])
+        job = QueuedAction.objects.get()
+
+        # Only on the admin of the model of the action
+        response = self.client.get(reverse("admin:market_item_queued_action", args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("admin:market_shop_queued_action", args=["unknown"]))
+        self.assertEqual(response.status_code, 404)
+
+        staff = User.objects.create_user(username="staff", password="pass", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("admin:market_shop_queued_action", args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_command_should_run_queued_actions_until_queue_is_empty(self):
+        shops = [ShopFactory(name=f"shop {i}") for i in range(2)]
+        self._confirm_capitalize_names_queued(shops[:1])
+        self._confirm_capitalize_names_queued(shops[1:])
+
+        out = StringIO()
+        call_command("run_confirmed_actions", "--once", stdout=out)
+
+        self.assertIn("Ran 2 queued actions", out.getvalue())
+        self.assertEqual(QueuedAction.objects.filter(status=DONE).count(), 2)
+        self.assertCountEqual(Shop.objects.values_list("name", flat=True), ["SHOP 0", "SHOP 1"])
+
+    def test_claim_should_skip_jobs_claimed_by_other_workers(self):
+        backend = DatabaseQueueBackend()
+        first = backend.enqueue(admin_site="admin", model="market.shop", action="a", selection=[], user_id=None)
+        second = backend.enqueue(admin_site="admin", model="market.shop", action="b", selection=[], user_id=None)
+
+        self.assertEqual(backend.claim()["id"], first)
+        self.assertEqual(backend.claim()["id"], second)
+        self.assertIsNone(backend.claim())
+
+    def test_worker_should_fail_action_left_running_by_stopped_worker(self):
+        backend = DatabaseQueueBackend()
+        stale = backend.enqueue(admin_site="admin", model="market.shop", action="a", selection=[], user_id=None)
+        running = backend.enqueue(admin_site="admin", model="market.shop", action="b", selection=[], user_id=None)
+        backend.claim()
+        backend.claim()
+        QueuedAction.objects.filter(pk=stale).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=QUEUE_STALE_TIMEOUT + 1)
+        )
+        backend.heartbeat(running)
+
+        self.assertFalse(run_next(backend))
+
+        stale_job = backend.get(stale)
+        self.assertEqual(stale_job["status"], FAILED)
+        self.assertEqual(stale_job["error"], STALE_ERROR)
+        self.assertIsNotNone(stale_job["finished_at"])
+        self.assertEqual(backend.get(running)["status"], RUNNING)
+
+    def test_backend_missing_methods_should_fail_when_created(self):
+        class IncompleteQueueBackend(BaseQueueBackend):
+            def enqueue(self, **kwargs):
+                return "1"
+
+        with self.assertRaisesRegex(TypeError, "abstract method"):
+            IncompleteQueueBackend()
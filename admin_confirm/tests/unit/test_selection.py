@@ -0,0 +1,62 @@
+from django.core import signing
+from django.test import TestCase
+
+from admin_confirm.selection import (
+    IN_BATCH_SIZE,
+    MAX_RANGES,
+    RANGES,
+    VALUES,
+    decode_pks,
+    dumps_selection,
+    encode_pks,
+    loads_selection,
+)
+from tests.factories import ShopFactory
+from tests.market.models import Item, Shop
+
+
+class TestSelection(TestCase):
+    def test_encode_should_delta_encode_ranges(self):
+        self.assertEqual(encode_pks([7, 3, 4, 5, 10, 11]), [RANGES, [3, 3, 2, 1, 3, 2]])
+        self.assertEqual(encode_pks(range(1, 100001)), [RANGES, [1, 100000]])
+        self.assertEqual(encode_pks([]), [RANGES, []])
+
+    def test_encode_should_keep_non_integer_pks_as_values(self):
+        self.assertEqual(encode_pks(["b", "a", "b"]), [VALUES, ["a", "b"]])
+
+    def test_decode_should_filter_on_encoded_pks(self):
+        shops = [ShopFactory() for i in range(6)]
+        pks = [shops[0].pk, shops[2].pk, shops[3].pk, shops[4].pk]
+
+        selection = Shop.objects.filter(decode_pks(encode_pks(pks)))
+
+        self.assertCountEqual(selection.values_list("pk", flat=True), pks)
+
+    def test_decode_should_filter_on_highly_fragmented_selection(self):
+        Shop.objects.bulk_create(ShopFactory.build_batch(6000))
+        all_pks = sorted(Shop.objects.values_list("pk", flat=True))
+        # Runs of two pks separated by a gap: one range per run would be too deep a query
+        pks = [pk for index, pk in enumerate(all_pks) if index % 3 != 2]
+        encoded = encode_pks(pks)
+        self.assertGreater(len(encoded[1]) // 2, MAX_RANGES)
+
+        selection = decode_pks(encoded)
+
+        self.assertLessEqual(len(selection), len(pks) // IN_BATCH_SIZE + 1)
+        self.assertCountEqual(Shop.objects.filter(selection).values_list("pk", flat=True), pks)
+
+    def test_token_of_large_contiguous_selection_should_be_small(self):
+        token = dumps_selection(range(1, 100001), Shop, "show_message")
+        self.assertLess(len(token), 200)
+
+    def test_loads_should_reject_altered_token(self):
+        token = dumps_selection([1, 2, 3], Shop, "show_message")
+        with self.assertRaises(signing.BadSignature):
+            loads_selection(token[:-2] + "xx", Shop, "show_message")
+
+    def test_loads_should_reject_token_of_other_action_or_model(self):
+        token = dumps_selection([1, 2, 3], Shop, "show_message")
+        with self.assertRaises(signing.BadSignature):
+            loads_selection(token, Shop, "show_description")
+        with self.assertRaises(signing.BadSignature):
+            loads_selection(token, Item, "show_message")
@@ -0,0 +1,61 @@
+import pickle
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from admin_confirm.serialization import deserialize_object, serialize_object
+from tests.factories import InventoryFactory, ItemFactory, ShopFactory
+from tests.market.models import Item, Shop, ShoppingMall
+
+
+class TestSerialization(TestCase):
+    def test_should_round_trip_new_object(self):
+        item = Item(
+            name="name",
+            price=Decimal("2.00"),
+            currency="CAD",
+            file=SimpleUploadedFile(name="test_file.jpg", content=b"content"),
+        )
+
+        rebuilt = deserialize_object(serialize_object(item), Item)
+
+        self.assertIsInstance(rebuilt, Item)
+        self.assertTrue(rebuilt._state.adding)
+        self.assertIsNone(rebuilt.id)
+        self.assertEqual(rebuilt.name, "name")
+        self.assertEqual(rebuilt.price, Decimal("2.00"))
+        self.assertEqual(rebuilt.currency, "CAD")
+        self.assertEqual(rebuilt.file.name, "test_file.jpg")
+        self.assertFalse(rebuilt.image)
+
+    def test_should_round_trip_existing_object_with_foreign_keys(self):
+        inventory = InventoryFactory(quantity=3)
+
+        rebuilt = deserialize_object(serialize_object(inventory), type(inventory))
+
+        self.assertFalse(rebuilt._state.adding)
+        self.assertEqual(rebuilt.id, inventory.id)
+        self.assertEqual(rebuilt.shop_id, inventory.shop_id)
+        self.assertEqual(rebuilt.item_id, inventory.item_id)
+        self.assertEqual(rebuilt.quantity, 3)
+
+    def test_should_only_store_concrete_field_values(self):
+        shop = ShopFactory()
+        for _ in range(20):
+            InventoryFactory(shop=shop, item=ItemFactory())
+        shop = Shop.objects.prefetch_related("inventory__item").get(id=shop.id)
+        self.assertEqual(len(shop.inventory.all()), 20)
+
+        payload = serialize_object(shop)
+
+        self.assertEqual(payload, ("market.shop", False, (shop.id, shop.name)))
+        self.assertLess(len(pickle.dumps(payload)), len(pickle.dumps(shop)))
+
+    def test_should_not_deserialize_for_other_model(self):
+        self.assertIsNone(deserialize_object(serialize_object(Shop(name="shop")), Item))
+        self.assertIsNone(deserialize_object(Shop(name="shop"), Item))
+
+    def test_should_accept_instances_cached_by_older_versions(self):
+        mall = ShoppingMall(name="mall")
+        self.assertIs(deserialize_object(mall, ShoppingMall), mall)
@@ -1,14 +1,33 @@
+from unittest import mock
+
 from django.test import SimpleTestCase
 
 from admin_confirm import AdminConfirmMixin, confirm_action
 from admin_confirm.exceptions import FormNotBoundException
-from admin_confirm.utils import snake_to_title_case
+from admin_confirm.utils import get_confirmation_namespace, snake_to_title_case
 
 
 class TestUtilsAndExports(SimpleTestCase):
     def test_snake_to_title_case(self):
         self.assertEqual(snake_to_title_case("save_as_new"), "Save As New")
 
+    def test_confirmation_namespace_should_depend_on_session_and_token(self):
+        request = mock.Mock(session=mock.Mock(session_key="session"))
+        other_request = mock.Mock(session=mock.Mock(session_key="other session"))
+        self.assertIsNone(get_confirmation_namespace(request, None))
+        self.assertEqual(
+            get_confirmation_namespace(request, "token"),
+            get_confirmation_namespace(request, "token"),
+        )
+        self.assertNotEqual(
+            get_confirmation_namespace(request, "token"),
+            get_confirmation_namespace(request, "other token"),
+        )
+        self.assertNotEqual(
+            get_confirmation_namespace(request, "token"),
+            get_confirmation_namespace(other_request, "token"),
+        )
+
     def test_package_exports(self):
         self.assertTrue(callable(confirm_action))
         self.assertIsNotNone(AdminConfirmMixin)
@@ -1,3 +1,6 @@
+import hashlib
+from typing import Optional
+
 from django.urls import reverse
 from admin_confirm.constants import CACHE_KEY_PREFIX, DEBUG
 
@@ -13,10 +16,36 @@ def get_admin_change_url(obj: object) -> str:
     )
 
 
-def format_cache_key(model: str, field: str) -> str:
+def format_cache_key(model: str, field: str, namespace: Optional[str] = None) -> str:
+    if namespace:
+        return f"{CACHE_KEY_PREFIX}__{namespace}__{model}__{field}"
     return f"{CACHE_KEY_PREFIX}__{model}__{field}"
 
 
+def format_namespaced_key(key: str, namespace: Optional[str] = None) -> str:
+    if namespace:
+        return f"{key}__{namespace}"
+    return key
+
+
+def get_confirmation_namespace(request, token: Optional[str]) -> Optional[str]:
+    """
+    Namespace for the cached data of a single confirmation.
+
+    It is derived from the session as well as the token, so a token cannot be used
+    to reach the cached data of another user's confirmation.
+    """
+    if not token:
+        return None
+    session = getattr(request, "session", None)
+    session_key = (session and session.session_key) or ""
+    return hashlib.sha256(f"{session_key}:{token}".encode()).hexdigest()[:32]
+
+
+def format_chunk_key(key: str, index: int) -> str:
+    return f"{key}__chunk__{index}"
+
+
 def log(message: str):  # pragma: no cover
     if DEBUG:
         print(message)
@@ -0,0 +1,168 @@
+"""Workers running the queued actions of admin_confirm.queue.
+
+Workers are threads of a process of their own, started with the `run_confirmed_actions`
+management command, so the actions never take up the workers serving requests.
+
+A queued action is run as the user who confirmed it, with a request built for that user,
+after checking again that the action is still allowed for them. Messages added by the
+action are kept with the job, to be shown on its status page.
+
+While running an action, a worker records a heartbeat every QUEUE_HEARTBEAT_INTERVAL seconds.
+An action without heartbeat for QUEUE_STALE_TIMEOUT seconds was left running by a worker
+which stopped, eg. killed, and is failed by the next worker checking the queue.
+"""
+
+import threading
+from typing import Optional
+
+from django.apps import apps
+from django.contrib.admin.sites import all_sites
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.base import BaseStorage
+from django.db import close_old_connections, connections
+from django.http import HttpRequest
+
+from admin_confirm.action_progress import DONE, FAILED
+from admin_confirm.admin import get_allowed_action
+from admin_confirm.constants import QUEUE_HEARTBEAT_INTERVAL, QUEUE_POLL_INTERVAL, QUEUE_STALE_TIMEOUT
+from admin_confirm.queue import BaseQueueBackend, get_progress_namespace, get_queue_backend
+from admin_confirm.selection import decode_pks
+from admin_confirm.utils import log
+
+
+class RecordedMessages(BaseStorage):
+    "Messages storage which only keeps the messages added while running the action"
+
+    def _get(self, *args, **kwargs):
+        return [], True
+
+    def _store(self, messages, response, *args, **kwargs):
+        return []
+
+
+class QueuedActionError(Exception):
+    pass
+
+
+class Heartbeat:
+    "Thread recording the heartbeat of the job while its action runs"
+
+    def __init__(self, backend: BaseQueueBackend, job_id: str, interval: float = QUEUE_HEARTBEAT_INTERVAL):
+        self.backend = backend
+        self.job_id = job_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.beat, name=f"admin_confirm-heartbeat-{job_id}", daemon=True)
+
+    def beat(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                self.backend.heartbeat(self.job_id)
+        finally:
+            # Database connections are per thread
+            connections.close_all()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def build_request(user) -> HttpRequest:
+    request = HttpRequest()
+    request.method = "POST"
+    request.user = user
+    request._messages = RecordedMessages(request)
+    return request
+
+
+def get_model_admin(job: dict):
+    model = apps.get_model(job["model"])
+    for site in all_sites:
+        if site.name == job["admin_site"] and model in site._registry:
+            return site._registry[model]
+    raise QueuedActionError(f"{job['model']} is not registered on admin site {job['admin_site']}")
+
+
+def run_job(job: dict):
+    """
+    Run the queued action of the job
+
+    Returns the messages added by the action
+    """
+    modeladmin = get_model_admin(job)
+    user = get_user_model()._default_manager.filter(pk=job["user_id"]).first()
+    if user is None or not user.is_active:
+        raise QueuedActionError("The user who confirmed the action is no longer active")
+    request = build_request(user)
+
+    action = get_allowed_action(modeladmin, request, job["action"])
+    run_confirmed = action and getattr(action[0], "run_confirmed", None)
+    if run_confirmed is None:
+        raise QueuedActionError(f"Action {job['action']} is not allowed")
+
+    queryset = modeladmin.get_queryset(request).filter(decode_pks(job["selection"]))
+    run_confirmed(modeladmin, request, queryset, get_progress_namespace(job["id"]))
+    return [str(message) for message in request._messages]
+
+
+def run_next(backend: Optional[BaseQueueBackend] = None) -> bool:
+    """
+    Run the oldest queued action, if any
+
+    Returns whether there was one to run
+    """
+    backend = backend or get_queue_backend()
+    stale_count = backend.fail_stale(QUEUE_STALE_TIMEOUT)
+    if stale_count:
+        log(f"Failed {stale_count} queued actions left running by stopped workers")
+    job = backend.claim()
+    if job is None:
+        return False
+
+    log(f"Running queued action {job['action']} on {job['model']}")
+    try:
+        with Heartbeat(backend, job["id"]):
+            messages = run_job(job)
+    except Exception as e:
+        log(f"Queued action {job['action']} failed: {e}")
+        backend.finish(job["id"], FAILED, [], str(e) or e.__class__.__name__)
+    else:
+        backend.finish(job["id"], DONE, messages)
+    return True
+
+
+class WorkerPool:
+    "Threads running the queued actions until stopped"
+
+    def __init__(self, size: int = 1, poll_interval: float = QUEUE_POLL_INTERVAL):
+        self.size = size
+        self.poll_interval = poll_interval
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def work(self):
+        backend = get_queue_backend()
+        while not self.stopped.is_set():
+            close_old_connections()
+            try:
+                ran = run_next(backend)
+            finally:
+                close_old_connections()
+            if not ran:
+                self.stopped.wait(self.poll_interval)
+
+    def start(self):
+        for index in range(self.size):
+            thread = threading.Thread(target=self.work, name=f"admin_confirm-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
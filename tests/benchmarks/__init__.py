@@ -0,0 +1 @@
+"""Benchmarks of the confirmation hot paths, run with `python -m tests.benchmarks`"""
@@ -0,0 +1,202 @@
+"""Benchmarks of the confirmation hot paths, on the models of tests.market.
+
+Each setup function creates its data and returns the function to measure, optionally
+along with a function cleaning up what the database rollback does not.
+"""
+
+import shutil
+import tempfile
+
+import factory
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from admin_confirm.constants import CONFIRMATION_RECEIVED
+from admin_confirm.file_cache import FileCache
+from tests.factories import ConsumerFactory, ItemFactory, ShopFactory, TransactionFactory
+from tests.market.models import Shop, Transaction
+
+from .runner import benchmark
+
+INLINE_ROWS = (0, 10, 100, 1000)
+QUICK_INLINE_ROWS = (0, 10, 100)
+ACTION_ROWS = (10, 100, 1000, 10000, 100000)
+QUICK_ACTION_ROWS = (10, 100, 1000)
+FILE_SIZES = ("10KB", "100KB", "1MB", "10MB", "50MB")
+QUICK_FILE_SIZES = ("10KB", "100KB", "1MB")
+FILE_CHUNK_SIZE = 1024 * 1024
+
+
+def get_client() -> Client:
+    client = Client()
+    client.force_login(User.objects.create_superuser(username="bench", email="bench@email.org", password="pass"))
+    return client
+
+
+def post(client: Client, url: str, data: dict, status_code: int):
+    "Post, making sure the benchmark measures the expected response rather than an error"
+    response = client.post(url, data)
+    assert response.status_code == status_code, f"{url} responded {response.status_code}"
+    return response
+
+
+def parse_size(size: str) -> int:
+    units = {"KB": 1024, "MB": 1024 * 1024}
+    return int(size[:-2]) * units[size[-2:]]
+
+
+def get_item_data(item, **changes) -> dict:
+    return {
+        "name": item.name,
+        "price": item.price,
+        "currency": item.currency,
+        "description": item.description,
+        "_confirm_change": True,
+        "_save": True,
+        **changes,
+    }
+
+
+@benchmark("changeform_view.show_confirmation")
+def changeform_show_confirmation(size):
+    client = get_client()
+    item = ItemFactory()
+    url = reverse("admin:market_item_change", args=[item.pk])
+    # price is a confirmation field of ItemAdmin
+    data = get_item_data(item, price=item.price + 1)
+    return lambda: post(client, url, data, 200)
+
+
+@benchmark("changeform_view.confirmed")
+def changeform_confirmed(size):
+    client = get_client()
+    item = ItemFactory()
+    url = reverse("admin:market_item_change", args=[item.pk])
+    data = get_item_data(item, price=item.price + 1, **{CONFIRMATION_RECEIVED: True})
+    del data["_confirm_change"]
+    return lambda: post(client, url, data, 302)
+
+
+@benchmark("changeform_view.without_confirmation")
+def changeform_without_confirmation(size):
+    client = get_client()
+    item = ItemFactory()
+    url = reverse("admin:market_item_change", args=[item.pk])
+    # name is not a confirmation field, so the change is saved right away
+    data = get_item_data(item, name=f"{item.name} changed")
+    return lambda: post(client, url, data, 302)
+
+
+@benchmark("change_confirmation_view.inline_rows", sizes=INLINE_ROWS, quick_sizes=QUICK_INLINE_ROWS, repeat=3)
+def change_confirmation_inline_rows(size):
+    client = get_client()
+    consumer = ConsumerFactory(name="consumer")
+    shop = ShopFactory()
+    Transaction.objects.bulk_create(TransactionFactory.build_batch(size, shop=shop, consumer=consumer))
+    data = {
+        "name": "consumer changed",
+        "email": consumer.email,
+        "_confirm_change": True,
+        "_save": True,
+        "transactions-TOTAL_FORMS": size,
+        "transactions-INITIAL_FORMS": size,
+        "transactions-MIN_NUM_FORMS": 0,
+        "transactions-MAX_NUM_FORMS": 1000,
+    }
+    for index, transaction in enumerate(consumer.transactions.order_by("pk")):
+        prefix = f"transactions-{index}"
+        data.update(
+            {
+                f"{prefix}-id": transaction.pk,
+                f"{prefix}-consumer": consumer.pk,
+                f"{prefix}-timestamp_0": transaction.timestamp.strftime("%Y-%m-%d"),
+                f"{prefix}-timestamp_1": transaction.timestamp.strftime("%H:%M:%S"),
+                # Only the first row is changed
+                f"{prefix}-total": transaction.total + 1 if index == 0 else transaction.total,
+                f"{prefix}-currency": transaction.currency,
+                f"{prefix}-shop": shop.pk,
+                f"{prefix}-date": transaction.date.strftime("%Y-%m-%d"),
+            }
+        )
+    url = reverse("admin:market_consumer_change", args=[consumer.pk])
+
+    def run():
+        with override_settings(DATA_UPLOAD_MAX_NUMBER_FIELDS=None):
+            post(client, url, data, 200)
+
+    return run
+
+
+def setup_shops(size):
+    Shop.objects.bulk_create(
+        ShopFactory.build_batch(size, name=factory.Sequence(lambda n: f"shop {n}")), batch_size=1000
+    )
+    return {
+        "action": "show_message",
+        # The whole changelist is selected, as it would be for that many rows
+        "select_across": "1",
+        "index": "0",
+        "_selected_action": [Shop.objects.values_list("pk", flat=True).first()],
+    }
+
+
+@benchmark("confirm_action.show_confirmation", sizes=ACTION_ROWS, quick_sizes=QUICK_ACTION_ROWS, repeat=3)
+def confirm_action_show_confirmation(size):
+    client = get_client()
+    data = setup_shops(size)
+    return lambda: post(client, reverse("admin:market_shop_changelist"), data, 200)
+
+
+@benchmark("confirm_action.confirmed", sizes=ACTION_ROWS, quick_sizes=QUICK_ACTION_ROWS, repeat=3)
+def confirm_action_confirmed(size):
+    client = get_client()
+    data = {**setup_shops(size), "_confirm_action": "Yes, I'm sure"}
+    return lambda: post(client, reverse("admin:market_shop_changelist"), data, 302)
+
+
+def get_file_cache(mode):
+    file_cache = FileCache()
+    if mode == "chunked":
+        file_cache.chunk_size = FILE_CHUNK_SIZE
+    elif mode == "spooled":
+        file_cache.spool_threshold = 0
+        file_cache.spool_dir = tempfile.mkdtemp(prefix="admin_confirm_bench")
+    return file_cache
+
+
+def cleanup_file_cache(file_cache):
+    file_cache.delete_all()
+    if file_cache.spool_threshold is not None:
+        shutil.rmtree(file_cache.spool_dir, ignore_errors=True)
+
+
+def register_file_cache_benchmarks(mode):
+    @benchmark(f"file_cache.{mode}.set", sizes=FILE_SIZES, quick_sizes=QUICK_FILE_SIZES)
+    def file_cache_set(size):
+        file_cache = get_file_cache(mode)
+        upload = SimpleUploadedFile("file.bin", b"x" * parse_size(size))
+
+        def run():
+            file_cache.set("key", upload)
+
+        return run, lambda: cleanup_file_cache(file_cache)
+
+    @benchmark(f"file_cache.{mode}.get", sizes=FILE_SIZES, quick_sizes=QUICK_FILE_SIZES)
+    def file_cache_get(size):
+        file_cache = get_file_cache(mode)
+        file_cache.set("key", SimpleUploadedFile("file.bin", b"x" * parse_size(size)))
+
+        def run():
+            upload = file_cache.get("key")
+            # Chunked and spooled files are only read when used
+            upload.read()
+            upload.close()
+
+        return run, lambda: cleanup_file_cache(file_cache)
+
+
+for file_cache_mode in ("default", "chunked", "spooled"):
+    register_file_cache_benchmarks(file_cache_mode)
@@ -0,0 +1,188 @@
+"""Runs the benchmarks of tests.benchmarks.cases and compares them to a baseline.
+
+Each benchmark is run on a fresh in-memory test database, its data being rolled back after it.
+The wall time of each run and the number of queries it issued are written as JSON:
+
+    {"meta": {...}, "results": {"<benchmark>[<size>]": {"time_min": ..., "time_median": ..., "queries": ...}}}
+
+With --compare, a benchmark regresses when its median time grows by more than --threshold
+(a ratio) and by more than --min-delta seconds, or when it issues more queries than in the baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+BENCHMARKS = []
+
+
+class Benchmark(NamedTuple):
+    name: str
+    # Sets up the data for a size, and returns the function to measure, or a tuple of
+    # it and a function cleaning up after it
+    setup: Callable
+    sizes: Sequence
+    # Sizes run with --quick
+    quick_sizes: Sequence
+    repeat: int
+
+
+def benchmark(name: str, sizes: Sequence = (None,), quick_sizes: Optional[Sequence] = None, repeat: int = 5):
+    "Register the decorated setup function as a benchmark, for each of the sizes"
+
+    def decorator(setup):
+        BENCHMARKS.append(Benchmark(name, setup, sizes, sizes if quick_sizes is None else quick_sizes, repeat))
+        return setup
+
+    return decorator
+
+
+def get_key(name: str, size) -> str:
+    return name if size is None else f"{name}[{size}]"
+
+
+def measure(run: Callable, repeat: int) -> dict:
+    from django.db import connection
+
+    from admin_confirm.dry_run import QueryCounter
+
+    times = []
+    for __ in range(repeat):
+        # Unlike connection.queries, not capped, and savepoints are not counted
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    return {
+        "time_min": min(times),
+        "time_median": statistics.median(times),
+        "queries": counter.query_count,
+        "repeat": repeat,
+    }
+
+
+def run_benchmarks(quick: bool = False, only: Optional[str] = None, repeat: Optional[int] = None) -> dict:
+    from django.db import transaction
+
+    results = {}
+    for bench in BENCHMARKS:
+        for size in bench.quick_sizes if quick else bench.sizes:
+            key = get_key(bench.name, size)
+            if only and only not in key:
+                continue
+            with transaction.atomic():
+                run = bench.setup(size)
+                run, teardown = run if isinstance(run, tuple) else (run, None)
+                try:
+                    results[key] = measure(run, repeat or bench.repeat)
+                finally:
+                    if teardown:
+                        teardown()
+                    transaction.set_rollback(True)
+            print(
+                f"{key:<50} {results[key]['time_median'] * 1000:>10.2f} ms {results[key]['queries']:>6} queries",
+                file=sys.stderr,
+            )
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta: float = 0) -> List[str]:
+    "Regressions of the results against the baseline results"
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]
+        delta = result["time_median"] - before["time_median"]
+        # Timings of fast benchmarks are too noisy to compare as ratios alone
+        if delta > before["time_median"] * threshold and delta > min_delta:
+            regressions.append(
+                f"{key}: median time {before['time_median'] * 1000:.2f} ms -> {result['time_median'] * 1000:.2f} ms"
+            )
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{key}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def setup_django():
+    # The benchmarks never need the S3 storage of the test project
+    os.environ.setdefault("USE_S3", "false")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.test_project.settings.test")
+
+    import django
+    from django.conf import settings
+
+    # Only the test database is used, so the database file of the test project is never opened
+    settings.DATABASES["default"]["NAME"] = ":memory:"
+
+    django.setup()
+
+    # The test project enables ADMIN_CONFIRM_DEBUG, whose output would be timed along
+    from admin_confirm import utils
+
+    utils.DEBUG = False
+
+
+def main(argv: Optional[Sequence] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks", description=__doc__.split("\n")[0])
+    parser.add_argument("--output", default="benchmark.json", help="File the results are written to")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to compare the results to")
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="Ratio of median time growth considered a regression"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=0.001, help="Seconds of median time growth ignored as noise"
+    )
+    parser.add_argument("--quick", action="store_true", help="Only run the smaller sizes")
+    parser.add_argument("--only", help="Only run the benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, help="Number of runs of each benchmark")
+    args = parser.parse_args(argv)
+
+    setup_django()
+
+    import django
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    from . import cases  # noqa: F401 registers the benchmarks
+
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        results = run_benchmarks(args.quick, args.only, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "meta": {
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "database": connection.vendor,
+                    "quick": args.quick,
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)["results"], args.threshold, args.min_delta)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regression against {args.compare}", file=sys.stderr)
+    return 0
@@ -1,6 +1,7 @@
 """ItemAdmin tests:
 - file fields should work with confirmation
 - readonly fields should work with confirmation
+- confirmation should stay within confirmation_query_budget
 """
 
 from django.contrib.admin import ModelAdmin, VERTICAL
@@ -12,6 +13,7 @@ class ItemAdmin(AdminConfirmMixin, ModelAdmin):
     confirm_change = True
     confirm_add = True
     confirmation_fields = ["price"]
+    confirmation_query_budget = {"render": 6, "submit": 6}
     radio_fields = {"currency": VERTICAL}
 
     list_display = ("name", "price", "currency")
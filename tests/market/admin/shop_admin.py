@@ -1,17 +1,30 @@
 """ShopAdmin tests:
 - confirmation_actions should work through the @confirm_action decorator
 - confirm_action should respect @admin.actions and work with it
+- confirm_action should run actions in chunks when given chunk_size
+- confirm_action should show the cost of a rolled back run when given dry_run
+- confirm_action should queue the action to run outside of the request when given queued
+- action confirmation should stay within confirmation_query_budget
 """
 
 from django.contrib import admin
 from django.contrib.admin import ModelAdmin
+from django.db.models.functions import Upper
 from admin_confirm import AdminConfirmMixin, confirm_action
 
 
 class ShopAdmin(AdminConfirmMixin, ModelAdmin):
     confirmation_fields = ["name"]
-    actions = ["show_message", "show_message_no_confirmation", "show_description"]
+    actions = [
+        "show_message",
+        "show_message_no_confirmation",
+        "show_description",
+        "show_message_in_chunks",
+        "capitalize_names",
+        "capitalize_names_queued",
+    ]
     search_fields = ["name"]
+    confirmation_query_budget = {"render": 5, "submit": 5}
 
     @confirm_action
     def show_message(modeladmin, request, queryset):
@@ -34,3 +47,21 @@ class ShopAdmin(AdminConfirmMixin, ModelAdmin):
     @admin.action(description="foobar description")
     def show_description(modeladmin, request, queryset):
         pass
+
+    @confirm_action(chunk_size=2)
+    def show_message_in_chunks(modeladmin, request, queryset):
+        shops = ", ".join(shop.name for shop in queryset)
+        modeladmin.message_user(request, f"Chunk: {shops}")
+
+    @confirm_action(dry_run=True)
+    def capitalize_names(modeladmin, request, queryset):
+        # Saves each shop separately on purpose, to be caught by the dry run
+        for shop in queryset:
+            shop.name = shop.name.upper()
+            shop.save(update_fields=["name"])
+        modeladmin.message_user(request, f"Capitalized {len(queryset)} shops")
+
+    @confirm_action(queued=True, chunk_size=2)
+    def capitalize_names_queued(modeladmin, request, queryset):
+        count = queryset.update(name=Upper("name"))
+        modeladmin.message_user(request, f"Capitalized {count} shops")
@@ -1,6 +1,7 @@
 """ShoppingMallAdmin tests:
 - confirm_add and confirm_change should work when inlines are present and with raw_id_fields
 - default confirmation_fields should include M2M fields and trigger confirmation when M2M field changes
+- confirmation with inlines should stay within confirmation_query_budget
 """
 
 from ..models import ShoppingMall
@@ -17,6 +18,8 @@ class ShoppingMallAdmin(AdminConfirmMixin, ModelAdmin):
     confirm_add = True
     confirm_change = True
     confirmation_fields = "__all__"
+    # Validating each ShopInline form queries its row, its shop and the uniqueness of the pair
+    confirmation_query_budget = {"render": (10, 4), "submit": (10, 4)}
 
     inlines = [ShopInline]
     raw_id_fields = ["general_manager"]